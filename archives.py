@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+from .evaluator import Evaluator
+from .event_matching import _to_datetime64
+
+# File name suffixes of the Arrow IPC (Feather version 2) format
+IPC_SUFFIXES = (".arrow", ".feather", ".ipc")
+
+
+# Function to open a Parquet or Arrow IPC file, returning its column names and a reader
+def _open_archive(path, memory_map):
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        import pyarrow.ipc as ipc
+        import pyarrow.parquet as pq
+    except ImportError as error:
+        raise ImportError("Reading Parquet and Arrow files requires pyarrow.") from error
+
+    name = str(path).lower()
+    if name.endswith((".parquet", ".pq")):
+        # Only the selected columns are decoded
+        names = pq.read_schema(path, memory_map=memory_map).names
+        return names, lambda columns: pq.read_table(
+            path, columns=columns, memory_map=memory_map
+        )
+    if name.endswith(IPC_SUFFIXES):
+        # The names come from the schema; only the selected columns are read (and
+        # decompressed when the file is compressed)
+        with pa.OSFile(str(path)) as source:
+            names = ipc.open_file(source).schema.names
+        return names, lambda columns: feather.read_table(
+            path, columns=columns, memory_map=memory_map
+        )
+    raise ValueError(
+        f"Unknown archive format of {path}: use .parquet, .pq, "
+        + ", ".join(IPC_SUFFIXES)
+    )
+
+
+# Function to turn a table column into a NumPy array, without a copy where possible
+def _column_array(column):
+    # Several chunks (Parquet row groups, IPC record batches) have to be joined
+    chunk = column.combine_chunks() if column.num_chunks != 1 else column.chunk(0)
+    # Numbers without missing values are handed over as a view of the Arrow buffer
+    return chunk.to_numpy(zero_copy_only=False)
+
+
+# Function to read many wells from a wide Parquet or Arrow IPC file
+def read_wells(path, wells=None, time_column="Time", memory_map=True):
+    """
+    Read the series of many wells from a Parquet or Arrow IPC (Feather) file.
+
+    The file holds one column of dates and one column of water levels per well.
+    Only the dates and the requested wells are read. Arrow IPC files are memory
+    mapped; the columns of an uncompressed file are handed over without a copy,
+    and only the requested columns of a compressed file are decompressed.
+    Parquet files are memory mapped, and only the requested columns are decoded.
+    Timestamp columns are kept as datetime64 and are not parsed again.
+
+    Parameters:
+    - path: Path of the file; ".parquet" or ".pq" selects Parquet, ".arrow", ".feather"
+      or ".ipc" Arrow IPC.
+    - wells: Names of the well columns to read (defaults to all columns but the dates).
+    - time_column: Column holding the dates.
+    - memory_map: Whether to memory map the file.
+
+    Returns:
+    - times: datetime64[ns] array of the dates.
+    - series: Dict mapping every well to its array of water levels (read-only when it
+      is a view of the file).
+    """
+    names, read = _open_archive(path, memory_map)
+    wells = [name for name in names if name != time_column] if wells is None else wells
+    columns = [time_column] + list(wells)
+    missing = [column for column in columns if column not in names]
+    if missing:
+        raise KeyError(f"Columns not found in {path}: {', '.join(missing)}")
+    table = read(columns)
+
+    # Timestamps are only converted to ns, dates stored as text are parsed
+    times = _to_datetime64(_column_array(table.column(time_column)))
+
+    series = {well: _column_array(table.column(well)) for well in columns[1:]}
+    return times, series
+
+
+# Function to evaluate the wells of an observed and a predicted archive
+def evaluate_archives(
+    observed,
+    predicted,
+    thresholdmp,
+    wells=None,
+    time_column="Time",
+    tolerance=3,
+    matching="greedy",
+    memory_map=True,
+):
+    """
+    Evaluate the predicted series of many wells stored in Parquet or Arrow IPC files.
+
+    Parameters:
+    - observed: Path of the observed archive (see read_wells).
+    - predicted: Path of the predicted archive, with the same dates and well columns.
+    - thresholdmp: Divider of the mean peak height used as rise threshold (see identify_points).
+    - wells: Names of the wells to evaluate (defaults to all wells of the observed archive).
+    - time_column: Column holding the dates.
+    - tolerance: Integer number of days to consider for matching peaks and jumps.
+    - matching: "greedy" or "optimal" event matching (see event_matching.match_events).
+    - memory_map: Whether to memory map the files.
+
+    Returns:
+    - DataFrame indexed by well with one row of metrics (see Evaluator.score).
+    """
+    times, observed_series = read_wells(observed, wells, time_column, memory_map)
+    predicted_times, predicted_series = read_wells(
+        predicted, list(observed_series), time_column, memory_map
+    )
+    if not np.array_equal(times, predicted_times):
+        raise ValueError("The observed and predicted archives have different dates.")
+
+    rows = []
+    for well, values in observed_series.items():
+        evaluator = Evaluator(
+            values, times, thresholdmp, tolerance=tolerance, matching=matching
+        )
+        rows.append(evaluator.evaluate(predicted_series[well]))
+    return pd.DataFrame(rows, index=pd.Index(list(observed_series), name="Well"))
@@ -0,0 +1,84 @@
+import argparse
+import sys
+
+from .suite import (
+    CASES,
+    MAX_TOTAL_SAMPLES,
+    SIZES,
+    WELL_COUNTS,
+    compare,
+    load,
+    run,
+    save,
+)
+
+
+# Function to print one benchmark result
+def _report(result):
+    print(
+        f"{result['function']:<24}{result['n_samples']:>12,}{result['n_wells']:>8}"
+        f"{result['time_min'] * 1000:>14.2f} ms"
+        f"{result['peak_memory'] / 2**20:>12.1f} MiB"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m gwlevaluation.benchmarks",
+        description="Benchmark critical point detection and scoring "
+        "on synthetic wells.",
+    )
+    parser.add_argument(
+        "--functions", nargs="+", choices=list(CASES), help="functions to benchmark"
+    )
+    parser.add_argument(
+        "--sizes", nargs="+", type=int, default=SIZES, help="samples per well"
+    )
+    parser.add_argument(
+        "--wells", nargs="+", type=int, default=WELL_COUNTS, help="numbers of wells"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="timed runs per benchmark"
+    )
+    parser.add_argument(
+        "--max-total-samples",
+        type=int,
+        default=MAX_TOTAL_SAMPLES,
+        help="skip combinations with more samples over all wells",
+    )
+    parser.add_argument("--output", help="save the results as JSON")
+    parser.add_argument("--baseline", help="JSON results to compare with")
+    parser.add_argument(
+        "--max-slowdown",
+        type=float,
+        default=0.2,
+        help="relative slowdown counted as a regression (default 0.2)",
+    )
+    args = parser.parse_args(argv)
+
+    print(
+        f"{'function':<24}{'samples':>12}{'wells':>8}{'time':>17}{'peak memory':>16}"
+    )
+    results = run(
+        functions=args.functions,
+        sizes=args.sizes,
+        well_counts=args.wells,
+        repeat=args.repeat,
+        max_total_samples=args.max_total_samples,
+        progress=_report,
+    )
+    if args.output:
+        save(results, args.output)
+
+    if args.baseline:
+        comparison = compare(results, load(args.baseline), args.max_slowdown)
+        print()
+        print(comparison.to_string(index=False))
+        if comparison["regression"].any():
+            print(f"\n{comparison['regression'].sum()} regression(s) found.")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+
+from ..data_processing import identify_points_batch
+
+# Sampling intervals tried for the dates, coarsest first
+_FREQUENCIES = ("1D", "1h", "15min", "1min")
+_START = pd.Timestamp("1970-01-01")
+
+
+# Function to generate a synthetic groundwater level series
+def synthetic_series(
+    n_samples,
+    seed=0,
+    base_level=10.0,
+    seasonal_amplitude=0.3,
+    season_length=365,
+    storm_rate=1 / 30,
+    storm_height=(0.1, 0.6),
+    recession=10.0,
+    noise=0.01,
+    resolution=0.01,
+):
+    """
+    Generate a water level series with seasonal recharge, storm jumps and noise.
+
+    Storms arrive at random and raise the level at once; the rise then recedes
+    exponentially. Levels are rounded to the sensor resolution, which produces
+    the flat stretches found in real records.
+
+    Parameters:
+    - n_samples: Length of the series.
+    - seed: Seed of the random generator.
+    - base_level: Mean water level.
+    - seasonal_amplitude: Amplitude of the seasonal recharge cycle.
+    - season_length: Number of samples in one seasonal cycle.
+    - storm_rate: Probability of a storm at every sample.
+    - storm_height: Range (low, high) of the jump caused by a storm.
+    - recession: Number of samples over which a storm jump recedes by a factor e.
+    - noise: Standard deviation of the measurement noise.
+    - resolution: Sensor resolution the levels are rounded to (0 to skip rounding).
+
+    Returns:
+    - levels: Array of water levels.
+    """
+    from scipy.signal import lfilter
+
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_samples)
+    seasonal = seasonal_amplitude * np.sin(2 * np.pi * t / season_length)
+
+    # Storm jumps as impulses, receding through a first-order filter
+    storms = np.zeros(n_samples)
+    is_storm = rng.random(n_samples) < storm_rate
+    storms[is_storm] = rng.uniform(*storm_height, size=is_storm.sum())
+    storm_levels = lfilter([1.0], [1.0, -np.exp(-1 / recession)], storms)
+
+    levels = base_level + seasonal + storm_levels + rng.normal(0, noise, n_samples)
+    if resolution:
+        levels = np.round(levels / resolution) * resolution
+    return levels
+
+
+# Function to generate a prediction of a synthetic series
+def synthetic_prediction(
+    observed, seed=0, lag=2, bias=0.05, noise=0.02, resolution=0.01
+):
+    """
+    Generate a model prediction for a series: delayed, biased and noisier.
+
+    Parameters:
+    - observed: Array of observed water levels (1-D, or 2-D with one well per row).
+    - seed: Seed of the random generator.
+    - lag: Number of samples the prediction lags behind the observations.
+    - bias: Relative bias of the predicted levels.
+    - noise: Standard deviation of the prediction noise.
+    - resolution: Resolution the levels are rounded to (0 to skip rounding).
+
+    Returns:
+    - predicted: Array of predicted water levels, shaped as observed.
+    """
+    rng = np.random.default_rng(seed)
+    observed = np.asarray(observed, dtype=float)
+    predicted = np.roll(observed, lag, axis=-1)
+    predicted[..., :lag] = observed[..., :1]
+    predicted = predicted * (1 + bias) + rng.normal(0, noise, observed.shape)
+    if resolution:
+        predicted = np.round(predicted / resolution) * resolution
+    return predicted
+
+
+# Function to generate the dates of a synthetic series
+def synthetic_dates(n_samples):
+    """
+    Generate dates for a series, daily when they fit in datetime64[ns].
+
+    Long series are given a shorter sampling interval (hourly, 15 minutes or
+    one minute) so that they end before 2262, the last date pandas can store.
+
+    Parameters:
+    - n_samples: Length of the series.
+
+    Returns:
+    - DatetimeIndex of the sample dates.
+    """
+    for freq in _FREQUENCIES:
+        if pd.Timedelta(freq).value * n_samples < (pd.Timestamp.max - _START).value:
+            return pd.date_range(_START, periods=n_samples, freq=freq)
+    raise ValueError(f"Cannot date {n_samples} samples in datetime64[ns].")
+
+
+# Function to generate observed and predicted series for many wells
+def synthetic_wells(n_wells, n_samples, seed=0):
+    """
+    Generate observed and predicted series for a set of wells.
+
+    Parameters:
+    - n_wells: Number of wells.
+    - n_samples: Length of every series.
+    - seed: Seed of the random generators (well i uses seed + i).
+
+    Returns:
+    - observed: 2-D array of observed water levels (wells x time).
+    - predicted: 2-D array of predicted water levels (wells x time).
+    - dates: DatetimeIndex of the sample dates.
+    """
+    observed = np.array(
+        [synthetic_series(n_samples, seed + well) for well in range(n_wells)]
+    ).reshape(n_wells, n_samples)
+    predicted = synthetic_prediction(observed, seed)
+    return observed, predicted, synthetic_dates(n_samples)
+
+
+# Function to build the DataFrame scored by peakdiff and the timing functions
+def synthetic_frame(observed, predicted, dates, thresholdmp, suffix="pred"):
+    """
+    Build a DataFrame with the columns expected by peakdiff, timediff and timingdiff_extra.
+
+    Parameters:
+    - observed: Array of observed water levels.
+    - predicted: Array of predicted water levels.
+    - dates: Dates of the samples.
+    - thresholdmp: Divider of the mean peak height used as rise threshold.
+    - suffix: Suffix of the predicted columns.
+
+    Returns:
+    - DataFrame with Time, WL, Rise, Local_Max and jump_point columns for both series.
+    """
+    rise, local_max, jump_points = identify_points_batch(
+        np.array([observed, predicted], dtype=float), thresholdmp
+    )
+    data = pd.DataFrame({"Time": dates, "WL": observed, f"WL_{suffix}": predicted})
+    for name, marks in (
+        ("Rise", rise & ~jump_points),
+        ("Local_Max", local_max),
+        ("jump_point", jump_points),
+    ):
+        data[name] = marks[0]
+        data[f"{name}_{suffix}"] = marks[1]
+    return data
@@ -0,0 +1,254 @@
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from .. import kernels
+from ..data_processing import (
+    calculate_stable_mean,
+    find_jump_points,
+    identify_points,
+    identify_points_batch,
+    threshold_cache,
+)
+from ..peak_difference import peakdiff
+from ..timing_score import timediff
+from ..timing_score_extra import timingdiff_extra
+from .generators import synthetic_frame, synthetic_wells
+
+THRESHOLDMP = 4
+TOLERANCE = 3
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+WELL_COUNTS = (1, 10)
+# Largest number of samples over all wells benchmarked by default
+MAX_TOTAL_SAMPLES = 10_000_000
+
+
+# Function to prepare a call of calculate_stable_mean on every well
+def _stable_mean_case(observed, predicted, dates):
+    return lambda: [calculate_stable_mean(values) for values in observed]
+
+
+# Function to prepare a call of identify_points on every well
+def _identify_points_case(observed, predicted, dates):
+    frames = [pd.DataFrame({"Time": dates, "WL": values}) for values in observed]
+
+    def call():
+        # Start from an empty threshold cache, or the warm-up run would leave every
+        # well cached and the timed runs would skip peak finding and the stable mean
+        threshold_cache.clear()
+        return [identify_points(data, "WL", THRESHOLDMP) for data in frames]
+
+    return call
+
+
+# Function to prepare a call of identify_points_batch on all wells at once
+def _identify_points_batch_case(observed, predicted, dates):
+    return lambda: identify_points_batch(observed, THRESHOLDMP)
+
+
+# Function to prepare a call of find_jump_points on every well
+def _find_jump_points_case(observed, predicted, dates):
+    rise, local_max, _ = identify_points_batch(observed, THRESHOLDMP)
+    series = [
+        (pd.Series(well_rise), pd.Series(well_max))
+        for well_rise, well_max in zip(rise, local_max)
+    ]
+    return lambda: [find_jump_points(*points) for points in series]
+
+
+# Function to prepare a call of a scoring function on every well
+def _scoring_case(function):
+    def prepare(observed, predicted, dates):
+        frames = [
+            synthetic_frame(well_observed, well_predicted, dates, THRESHOLDMP)
+            for well_observed, well_predicted in zip(observed, predicted)
+        ]
+        return lambda: [function(data, "pred", tolerance=TOLERANCE) for data in frames]
+
+    return prepare
+
+
+CASES = {
+    "calculate_stable_mean": _stable_mean_case,
+    "identify_points": _identify_points_case,
+    "identify_points_batch": _identify_points_batch_case,
+    "find_jump_points": _find_jump_points_case,
+    "peakdiff": _scoring_case(peakdiff),
+    "timediff": _scoring_case(timediff),
+    "timingdiff_extra": _scoring_case(timingdiff_extra),
+}
+
+
+# Function to time a call and measure its peak memory
+def measure(call, repeat=3):
+    """
+    Measure the run time and peak memory of a call.
+
+    The call is run once to warm up (compiled kernels, caches), then timed
+    repeat times, then run once more under tracemalloc for the peak memory,
+    so the tracing does not slow down the timed runs.
+
+    Parameters:
+    - call: Function without arguments to measure.
+    - repeat: Number of timed runs.
+
+    Returns:
+    - Dict with the fastest and median run time in seconds ("time_min", "time_median")
+      and the peak memory allocated during the call in bytes ("peak_memory").
+    """
+    call()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        call()
+        peak_memory = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "time_min": min(times),
+        "time_median": statistics.median(times),
+        "peak_memory": peak_memory,
+    }
+
+
+# Function to run the benchmarks
+def run(
+    functions=None,
+    sizes=SIZES,
+    well_counts=WELL_COUNTS,
+    repeat=3,
+    max_total_samples=MAX_TOTAL_SAMPLES,
+    seed=0,
+    progress=None,
+):
+    """
+    Benchmark the detection and scoring functions on synthetic wells.
+
+    Parameters:
+    - functions: Names of the functions to benchmark (keys of CASES, defaults to all).
+    - sizes: Numbers of samples per well.
+    - well_counts: Numbers of wells.
+    - repeat: Number of timed runs per benchmark.
+    - max_total_samples: Combinations with more samples over all wells are skipped.
+    - seed: Seed of the synthetic series.
+    - progress: Optional function called with every result as it is measured.
+
+    Returns:
+    - Dict with the environment ("metadata") and one entry per function, size and
+      well count ("results"), ready to be saved with save().
+    """
+    functions = list(CASES) if functions is None else list(functions)
+    unknown = set(functions) - set(CASES)
+    if unknown:
+        raise ValueError(f"Unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    results = []
+    for n_samples in sizes:
+        for n_wells in well_counts:
+            if n_samples * n_wells > max_total_samples:
+                continue
+            observed, predicted, dates = synthetic_wells(n_wells, n_samples, seed)
+            for name in functions:
+                call = CASES[name](observed, predicted, dates)
+                result = {
+                    "function": name,
+                    "n_samples": n_samples,
+                    "n_wells": n_wells,
+                    **measure(call, repeat),
+                }
+                results.append(result)
+                if progress is not None:
+                    progress(result)
+    return {"metadata": environment(), "results": results}
+
+
+# Function to describe the environment the benchmarks ran in
+def environment():
+    """
+    Describe the machine and library versions, stored with the results.
+
+    Returns:
+    - Dict of environment details.
+    """
+    return {
+        "created": pd.Timestamp.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "numba": kernels.use_numba(),
+    }
+
+
+# Function to save benchmark results as JSON
+def save(results, path):
+    with open(path, "w") as file:
+        json.dump(results, file, indent=2)
+
+
+# Function to load benchmark results saved with save
+def load(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+# Function to compare benchmark results with a baseline
+def compare(results, baseline, max_slowdown=0.2):
+    """
+    Compare benchmark results with a baseline run.
+
+    Parameters:
+    - results: Results as returned by run (or load).
+    - baseline: Baseline results, for example saved from the previous version.
+    - max_slowdown: Relative increase of the fastest run time (or of the peak memory)
+      above which a benchmark counts as a regression.
+
+    Returns:
+    - DataFrame with one row per benchmark found in both runs, holding the time and
+      memory ratios (current / baseline) and a "regression" flag.
+    """
+    key = ["function", "n_samples", "n_wells"]
+    current = pd.DataFrame(results["results"])
+    previous = pd.DataFrame(baseline["results"])
+    if current.empty or previous.empty:
+        return pd.DataFrame(
+            columns=key + ["time_ratio", "memory_ratio", "regression"]
+        )
+    merged = current.merge(previous, on=key, suffixes=("", "_baseline"))
+    merged["time_ratio"] = merged["time_min"] / merged["time_min_baseline"]
+    merged["memory_ratio"] = merged["peak_memory"] / merged[
+        "peak_memory_baseline"
+    ].clip(lower=1)
+    # Small allocations vary from run to run, so memory growth below 1 MiB is ignored
+    memory_growth = merged["peak_memory"] - merged["peak_memory_baseline"]
+    merged["regression"] = (merged["time_ratio"] > 1 + max_slowdown) | (
+        (merged["memory_ratio"] > 1 + max_slowdown) & (memory_growth > 2**20)
+    )
+    return merged[
+        key
+        + [
+            "time_min_baseline",
+            "time_min",
+            "time_ratio",
+            "peak_memory_baseline",
+            "peak_memory",
+            "memory_ratio",
+            "regression",
+        ]
+    ]
@@ -0,0 +1,115 @@
+import hashlib
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+CacheInfo = namedtuple(
+    "CacheInfo", ["hits", "misses", "maxsize", "currsize", "maxbytes", "nbytes"]
+)
+
+# Default of LRUCache.resize keeping the current byte limit
+_UNCHANGED = object()
+
+
+# Function to hash the content of an array together with some parameters
+def fingerprint(values, *parameters):
+    """
+    Compute a content hash of an array and parameters, to be used as cache key.
+
+    Parameters:
+    - values: Array to hash (its shape and dtype are part of the hash).
+    - parameters: Further values with a stable repr, such as numbers and strings.
+
+    Returns:
+    - Hex digest of 32 characters.
+    """
+    values = np.ascontiguousarray(values)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((values.shape, values.dtype.str, parameters)).encode())
+    digest.update(values.view(np.uint8).reshape(-1).data)
+    return digest.hexdigest()
+
+
+# Function to count the bytes held by the arrays of a cache entry
+def _nbytes(value):
+    if isinstance(value, dict):
+        return sum(_nbytes(item) for item in value.values())
+    return value.nbytes if isinstance(value, np.ndarray) else 0
+
+
+# Keep the most recently used results up to a number of entries and bytes
+class LRUCache:
+    """
+    Least-recently-used cache with a bounded number of entries and size.
+
+    Parameters:
+    - maxsize: Maximum number of entries kept (0 disables the cache).
+    - maxbytes: Maximum number of bytes held by the arrays of all entries
+      (None for no limit). An entry larger than this is not kept.
+    """
+
+    def __init__(self, maxsize=32, maxbytes=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+
+    def get(self, key):
+        """Return the entry stored under key (marking it as recently used), or None."""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """Store an entry, evicting the least recently used ones beyond maxsize."""
+        if self.maxsize <= 0:
+            return
+        # An entry can be stored again after it grew, so its size is counted anew
+        self.nbytes += _nbytes(value) - self._sizes.get(key, 0)
+        self._sizes[key] = _nbytes(value)
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        self._evict()
+
+    def resize(self, maxsize, maxbytes=_UNCHANGED):
+        """
+        Change the maximum number of entries and, if given, of bytes (None for no
+        limit), evicting entries if needed.
+        """
+        self.maxsize = maxsize
+        if maxbytes is not _UNCHANGED:
+            self.maxbytes = maxbytes
+        self._evict()
+
+    def clear(self):
+        """Remove all entries and reset the statistics."""
+        self._entries.clear()
+        self._sizes.clear()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        """Return the hit and miss counts and the maximum and current entries and bytes."""
+        return CacheInfo(
+            self.hits,
+            self.misses,
+            self.maxsize,
+            len(self._entries),
+            self.maxbytes,
+            self.nbytes,
+        )
+
+    def _evict(self):
+        while self._entries and (
+            len(self._entries) > self.maxsize
+            or (self.maxbytes is not None and self.nbytes > self.maxbytes)
+        ):
+            key, _ = self._entries.popitem(last=False)
+            self.nbytes -= self._sizes.pop(key)
@@ -0,0 +1,180 @@
+import numpy as np
+
+from .evaluator import score_events
+from .streaming import StreamingDetector
+
+
+# Function to read a series chunk by chunk without loading it whole
+def iter_chunks(source, chunk_size=1_000_000):
+    """
+    Read a series in chunks.
+
+    Parameters:
+    - source: Array (including memory-mapped arrays), path to a .npy file (memory-mapped),
+      or a (path, column) pair naming a column of a Parquet file (read batch by batch;
+      requires pyarrow).
+    - chunk_size: Maximum number of samples per chunk.
+
+    Returns:
+    - Iterator over NumPy arrays holding consecutive parts of the series.
+    """
+    if isinstance(source, tuple):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as error:
+            raise ImportError("Reading Parquet files requires pyarrow.") from error
+        path, column = source
+        for batch in pq.ParquetFile(path).iter_batches(
+            batch_size=chunk_size, columns=[column]
+        ):
+            yield batch.column(0).to_numpy(zero_copy_only=False)
+        return
+
+    if isinstance(source, str):
+        source = np.load(source, mmap_mode="r")
+    for start in range(0, len(source), chunk_size):
+        yield np.asarray(source[start : start + chunk_size])
+
+
+# Function to find the critical points of a series chunk by chunk
+def detect_events_chunked(
+    source,
+    thresholdmp,
+    stable_threshold=0.05,
+    min_stable_length=6,
+    chunk_size=1_000_000,
+):
+    """
+    Identify the critical points of a series that does not fit in memory.
+
+    A first pass over the chunks collects the stable-period and peak statistics
+    for the rise threshold; a second pass detects the points with it. Rises,
+    peaks and plateaus spanning chunk borders are carried over between chunks,
+    so the points are those of detect_events on the whole series.
+
+    Parameters:
+    - source: Series to read, see iter_chunks.
+    - thresholdmp: Divider of the mean peak height used as rise threshold.
+    - stable_threshold: Maximum difference between consecutive values in a stable period.
+    - min_stable_length: Minimum number of samples for a period to count as stable.
+    - chunk_size: Maximum number of samples per chunk.
+
+    Returns:
+    - rise_indices, local_max_indices, jump_indices: Sorted positions of the points.
+    - local_max_values: Water levels at the local maxima.
+    """
+    statistics = StreamingDetector(
+        thresholdmp,
+        stable_threshold=stable_threshold,
+        min_stable_length=min_stable_length,
+    )
+    for chunk in iter_chunks(source, chunk_size):
+        statistics.observe(chunk)
+
+    detector = StreamingDetector(
+        stable_threshold=stable_threshold,
+        min_stable_length=min_stable_length,
+        threshold_diff=statistics.threshold,
+    )
+    points = ([], [], [])
+    local_max_values = []
+    last_value = np.nan
+    for chunk in iter_chunks(source, chunk_size):
+        start = detector.n_samples
+        found = detector.extend(chunk)
+        for collected, indices in zip(points, found):
+            collected.append(indices)
+        # A local max can be the last sample of the previous chunk
+        values_with_last = np.concatenate(([last_value], chunk))
+        local_max_values.append(values_with_last[found[1] - start + 1])
+        if len(chunk):
+            last_value = chunk[-1]
+
+    rise_indices, local_max_indices, jump_indices = (
+        np.concatenate(collected) if collected else np.zeros(0, dtype=np.int64)
+        for collected in points
+    )
+    local_max_values = (
+        np.concatenate(local_max_values) if local_max_values else np.zeros(0)
+    )
+    return rise_indices, local_max_indices, jump_indices, local_max_values
+
+
+# Function to pick the dates at given positions from a chunked date series
+def _take_chunked(source, positions, chunk_size):
+    positions = np.unique(positions)
+    taken = []
+    start = 0
+    for chunk in iter_chunks(source, chunk_size):
+        low, high = np.searchsorted(positions, [start, start + len(chunk)])
+        taken.append(np.asarray(chunk)[positions[low:high] - start])
+        start += len(chunk)
+    dates = np.concatenate(taken) if taken else np.zeros(0, dtype="datetime64[ns]")
+    return positions, dates.astype("datetime64[ns]")
+
+
+# Function to evaluate a predicted series against an observed one chunk by chunk
+def evaluate_chunked(
+    observed,
+    predicted,
+    test_dates,
+    thresholdmp,
+    tolerance=3,
+    matching="greedy",
+    stable_threshold=0.05,
+    min_stable_length=6,
+    chunk_size=1_000_000,
+):
+    """
+    Evaluate series larger than memory.
+
+    The observed and predicted series and the dates are read chunk by chunk
+    (see iter_chunks), each on its own, so their files may be chunked
+    differently. Only the critical points are kept in memory; they are matched
+    over the whole series at the end, so tolerance windows crossing chunk
+    borders are handled as in an in-memory evaluation.
+
+    Parameters:
+    - observed: Observed series to read, see iter_chunks.
+    - predicted: Predicted series to read, see iter_chunks.
+    - test_dates: Dates of the samples to read, see iter_chunks (datetime64 values).
+    - thresholdmp: Divider of the mean peak height used as rise threshold.
+    - tolerance: Integer number of days to consider for matching peaks and jumps.
+    - matching: "greedy" or "optimal" event matching (see event_matching.match_events).
+    - stable_threshold: Maximum difference between consecutive values in a stable period.
+    - min_stable_length: Minimum number of samples for a period to count as stable.
+    - chunk_size: Maximum number of samples per chunk.
+
+    Returns:
+    - Dict of metrics, as Evaluator.score.
+    """
+    settings = {
+        "stable_threshold": stable_threshold,
+        "min_stable_length": min_stable_length,
+        "chunk_size": chunk_size,
+    }
+    _, peaks_1, jumps_1, peak_values_1 = detect_events_chunked(
+        observed, thresholdmp, **settings
+    )
+    _, peaks_2, jumps_2, peak_values_2 = detect_events_chunked(
+        predicted, thresholdmp, **settings
+    )
+
+    # Look up the dates of all points in one pass over the dates
+    positions, dates = _take_chunked(
+        test_dates, np.concatenate((peaks_1, jumps_1, peaks_2, jumps_2)), chunk_size
+    )
+
+    def dates_at(indices):
+        return dates[np.searchsorted(positions, indices)]
+
+    return score_events(
+        dates_at(peaks_1),
+        peak_values_1,
+        dates_at(jumps_1),
+        dates_at(peaks_2),
+        peak_values_2,
+        dates_at(jumps_2),
+        tolerance=tolerance,
+        matching=matching,
+    )
@@ -1,7 +1,40 @@
-from scipy.signal import find_peaks
+import logging
+
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+
+from . import kernels
+from .caching import LRUCache, fingerprint
+from .profiling import timed_stage
+
+logger = logging.getLogger(__name__)
+
+# Threshold-independent intermediates of recently analysed series, keyed by their content
+threshold_cache = LRUCache(maxsize=16, maxbytes=256 * 2**20)
+
+# Whether the full-length arrays of the rise scan are cached too (see set_array_caching)
+_cache_arrays = False
+
+
+# Function to choose whether the full-length arrays of the rise scan are cached
+def set_array_caching(enabled):
+    """
+    Choose whether threshold_cache also keeps the level differences and next-fall
+    positions of the rise scan (NumPy path only).
+
+    These take 16 bytes per sample, so they are only cached on request. The
+    cache then holds at most threshold_cache.maxbytes bytes (256 MiB by
+    default, change it with threshold_cache.resize).
+
+    Parameters:
+    - enabled: True to cache the arrays, False to cache only the stable mean and peak height.
+
+    Returns:
+    - Previous setting.
+    """
+    global _cache_arrays
+    previous, _cache_arrays = _cache_arrays, bool(enabled)
+    return previous
 
 
 # Function to load observed and predicted data
@@ -11,245 +44,453 @@ def load_time_series(data, test_dates, name):
     )
 
 
+# Function to mark the samples that belong to sufficiently long stable runs (along the last axis)
+def _stable_run_mask(values, threshold, min_stable_length):
+    values = np.asarray(values, dtype=float)
+    # A sample is stable when its difference to the previous sample is below the threshold
+    stable = np.zeros(values.shape, dtype=bool)
+    stable[..., 1:] = np.abs(np.diff(values, axis=-1)) < threshold
+    # The first sample of every row is never stable, so runs cannot cross rows once flattened
+    stable = stable.ravel()
+    # Run boundaries: +1 where a stable run starts, -1 one past where it ends
+    edges = np.diff(np.concatenate(([0], stable.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    long_enough = (ends - starts) >= min_stable_length
+    # Expand the qualifying runs back into a mask with a cumulative sum of markers
+    markers = np.zeros(len(stable) + 1, dtype=np.int64)
+    markers[starts[long_enough]] += 1
+    markers[ends[long_enough]] -= 1
+    return (np.cumsum(markers[:-1]) > 0).reshape(values.shape)
+
+
+# Function to find, for every position, the next position where the mask is True (along the last axis)
+def _next_true_index(mask):
+    mask = np.asarray(mask, dtype=bool)
+    n = mask.shape[-1]
+    # Candidate positions, with n standing in for "no such position"
+    positions = np.where(mask, np.arange(n), n)
+    positions = np.concatenate((positions, np.full(mask.shape[:-1] + (1,), n)), axis=-1)
+    # Reverse running minimum gives the first True at or after each position
+    at_or_after = np.flip(np.minimum.accumulate(np.flip(positions, -1), axis=-1), -1)
+    # Shift by one so that only positions strictly after are considered
+    return at_or_after[..., 1:]
+
+
+# Function to drop repeated values from a sorted array in linear time (unlike np.unique)
+def _unique_sorted(values):
+    keep = np.ones(len(values), dtype=bool)
+    keep[1:] = values[1:] != values[:-1]
+    return values[keep]
+
+
+# Function to mark the local maxima the way scipy.signal.find_peaks does (along the last axis)
+def _local_maxima_mask(values):
+    values = np.asarray(values, dtype=float)
+    steps = np.diff(values, axis=-1)
+    # Positions of the steps that are not flat (rises, falls and steps involving NaN)
+    n_steps = steps.shape[-1]
+    not_flat = np.where(steps != 0, np.arange(n_steps), -1)
+    last_not_flat = np.maximum.accumulate(not_flat, axis=-1)
+    # A fall whose previous non-flat step is a rise closes a peak or a plateau
+    *rows, falls = np.nonzero(steps < 0)
+    rows = tuple(rows)
+    previous = np.full(len(falls), -1)
+    has_previous = falls > 0
+    previous[has_previous] = last_not_flat[rows + (falls - 1,)][has_previous]
+    closes_peak = previous >= 0
+    closes_peak[closes_peak] = steps[rows + (previous,)][closes_peak] > 0
+    # Plateaus are reduced to their middle sample
+    rows = tuple(r[closes_peak] for r in rows)
+    middle = (previous[closes_peak] + 1 + falls[closes_peak]) // 2
+    mask = np.zeros(values.shape, dtype=bool)
+    mask[rows + (middle,)] = True
+    return mask
+
+
 # Function to identify the base groundwater level.
-def calculate_stable_mean(data, column_name, threshold=0.05, min_stable_length=6):
-    # Calculate the differences between consecutive values
-    diffs = data[column_name].diff().abs()
-    # Identify periods where the diff is below the threshold
-    stable_periods = diffs < threshold
-    # Find indices where the stable periods are long enough
-    stable_indices = []
-    current_stable_start = None
-    for i in range(len(stable_periods)):
-        if stable_periods.iloc[i]:
-            if current_stable_start is None:
-                current_stable_start = i
-        else:
-            if (
-                current_stable_start is not None
-                and (i - current_stable_start) >= min_stable_length
-            ):
-                stable_indices.extend(range(current_stable_start, i))
-            current_stable_start = None
-
-    # If the stable period extends to the end of the series, check the last stable period
-    if (
-        current_stable_start is not None
-        and (len(stable_periods) - current_stable_start) >= min_stable_length
-    ):
-        stable_indices.extend(range(current_stable_start, len(stable_periods)))
-
-    # Get the stable values based on the identified indices
-    stable_values = data[column_name].iloc[stable_indices]
+def calculate_stable_mean(data, column_name=None, threshold=0.05, min_stable_length=6):
+    """
+    Calculate the mean water level over stable periods.
+
+    Parameters:
+    - data: DataFrame containing the time series data, or a 1-D array of water levels.
+    - column_name: Column holding the water levels (ignored for arrays).
+    - threshold: Maximum absolute difference between consecutive values in a stable period.
+    - min_stable_length: Minimum number of samples for a period to count as stable.
+
+    Returns:
+    - stable_mean_value: Mean of the stable values, or the lowest point if no stable period is found.
+    """
+    if isinstance(data, pd.DataFrame):
+        values = data[column_name].to_numpy(dtype=float)
+    else:
+        values = np.asarray(data, dtype=float)
+
+    with timed_stage("stable_mean"):
+        stable_values = values[_stable_run_mask(values, threshold, min_stable_length)]
 
     # Calculate the mean of the stable values or handle the case where no stable period is found
-    if not stable_values.empty:
+    if stable_values.size:
         stable_mean_value = stable_values.mean()
     else:
-        stable_mean_value = data[column_name].min()  # Use the lowest point
-        print("Caution! No stable period detected, lowest point used.")
+        stable_mean_value = np.nanmin(values)  # Use the lowest point
+        logger.warning("Caution! No stable period detected, lowest point used.")
 
     return stable_mean_value
 
 
-# Function to identify peaks and jump points
-def identify_points(data, column_name, thresholdmp):
-    # Calculate the local maxima
-    peaks, _ = find_peaks(data[column_name])
-    local_maxima = data[column_name].iloc[peaks]
-    # Calculate the base groundwater level
-    stable_mean = calculate_stable_mean(
-        data, column_name, threshold=0.05, min_stable_length=6
-    )
-    print(f"The mean value during stable periods is: {stable_mean}")
+# Function to calculate the base groundwater level and the rise threshold
+def _rise_threshold(values, thresholdmp, stable_threshold, min_stable_length):
+    # Only the division by thresholdmp depends on the threshold, the rest is cached
+    # (hashing the series is skipped when the cache is disabled)
+    key = None
+    intermediates = None
+    if threshold_cache.maxsize > 0:
+        key = fingerprint(values, float(stable_threshold), int(min_stable_length))
+        intermediates = threshold_cache.get(key)
+    if intermediates is None:
+        # Calculate the local maxima
+        with timed_stage("peak_finding"):
+            local_maxima = values[_local_maxima_mask(values)]
+        # Calculate the base groundwater level
+        stable_mean = calculate_stable_mean(
+            values, threshold=stable_threshold, min_stable_length=min_stable_length
+        )
+        intermediates = {
+            "key": key,
+            "stable_mean": stable_mean,
+            "peak_height": (
+                (local_maxima - stable_mean).mean() if local_maxima.size else np.nan
+            ),
+        }
+        if key is not None:
+            threshold_cache.put(key, intermediates)
     # Calculate the threshold_diff
-    threshold_diff = (local_maxima - stable_mean).mean() / thresholdmp
-    print("Threshold:", threshold_diff)
-    # Identify points where WL starts to rise and fall
-    data["WL_diff"] = data[column_name].diff()
-    data["Rise"] = (data["WL_diff"] > threshold_diff).shift(-1).fillna(False)
-    # Initialize an empty list to store the local maxima indices
-    local_max_indices = []
-    # Scan through the points after start rise, once start to fall mark as local max
-    for i in range(len(data)):
-        if data["Rise"].iloc[i]:
-            for j in range(i + 1, len(data)):
-                if data["WL_diff"].iloc[j] < 0:
-                    local_max_indices.append(j)
-                    break
-    # Mark the local maxima in the dataframe
-    data["Local_Max"] = data.index.isin(local_max_indices)
-    data["Local_Max"] = data["Local_Max"].shift(-1).fillna(False)
+    threshold_diff = intermediates["peak_height"] / thresholdmp
+    return intermediates["stable_mean"], threshold_diff, intermediates
 
-    return data
+
+# Function to find the start rise points and the local maxima for a given rise threshold
+@timed_stage("rise_scan")
+def _rise_and_peak_indices(values, threshold_diff, intermediates=None):
+    if kernels.use_numba():
+        return kernels.rise_and_peak_scan(values, threshold_diff)
+    # The differences and the next fall after every point do not depend on the
+    # threshold, so they are kept with the cached intermediates if array caching is on
+    if intermediates is not None and "wl_diff" in intermediates:
+        wl_diff, next_fall = intermediates["wl_diff"], intermediates["next_fall"]
+    else:
+        # Identify points where WL starts to rise and fall
+        wl_diff = np.diff(values)
+        falling = np.zeros(len(values), dtype=bool)
+        falling[1:] = wl_diff < 0
+        next_fall = _next_true_index(falling)
+        if _cache_arrays and intermediates and intermediates["key"] is not None:
+            intermediates.update(wl_diff=wl_diff, next_fall=next_fall)
+            # Stored again so that the cache counts the bytes of the arrays
+            threshold_cache.put(intermediates["key"], intermediates)
+    rise_indices = np.flatnonzero(wl_diff > threshold_diff)
+    # Scan through the points after start rise, once start to fall mark the point before
+    # (next_fall is monotone, so the falls of the sorted rises come out sorted)
+    falls = next_fall[rise_indices]
+    local_max_indices = _unique_sorted(falls[falls < len(values)]) - 1
+    return rise_indices, local_max_indices
 
 
-# Function to plot the observed and predicted time series with identified points
-def plot_observed_predicted_points(
-    test_dates, data_observed, observedpoints, data_predicted, predictedpoints
+# Function to identify rise, peak and jump points without touching the input
+def detect_events(
+    values,
+    thresholdmp,
+    stable_threshold=0.05,
+    min_stable_length=6,
+    threshold_diff=None,
 ):
-    plt.figure(figsize=(12, 8))
-    plt.plot(
-        test_dates, data_observed["WL"], marker="o", linestyle="-", label="Observed WL"
-    )
-    plt.plot(
-        test_dates,
-        data_predicted["WL"],
-        marker="o",
-        linestyle="-",
-        label="Predicted WL",
-    )
-    plt.scatter(
-        test_dates[observedpoints["Rise"]],
-        observedpoints["WL"][observedpoints["Rise"]],
-        color="green",
-        label="Rise Points (Observed)",
-        zorder=5,
-    )
-    plt.scatter(
-        test_dates[observedpoints["Local_Max"]],
-        observedpoints["WL"][observedpoints["Local_Max"]],
-        color="red",
-        label="Peak Points (Observed)",
-        zorder=5,
-    )
-    plt.scatter(
-        test_dates[predictedpoints["Rise"]],
-        predictedpoints["WL"][predictedpoints["Rise"]],
-        color="blue",
-        label="Rise Points (Predicted)",
-        zorder=5,
+    """
+    Identify the critical points of a series given as an array.
+
+    The input is only read, so read-only arrays and views can be passed
+    without copying.
+
+    Parameters:
+    - values: 1-D array of water levels.
+    - thresholdmp: Divider of the mean peak height used as rise threshold.
+    - stable_threshold: Maximum difference between consecutive values in a stable period.
+    - min_stable_length: Minimum number of samples for a period to count as stable.
+    - threshold_diff: Fixed rise threshold to use instead of the one derived from thresholdmp.
+
+    Returns:
+    - rise_indices: Sorted positions of the start rise points (the "Rise" column of identify_points).
+    - local_max_indices: Sorted positions of the local maxima (the "Local_Max" column).
+    - jump_indices: Sorted positions of the jump points (as returned by find_jump_points).
+    """
+    values = np.asarray(values, dtype=float)
+    intermediates = None
+    if threshold_diff is None:
+        _, threshold_diff, intermediates = _rise_threshold(
+            values, thresholdmp, stable_threshold, min_stable_length
+        )
+    rise_indices, local_max_indices = _rise_and_peak_indices(
+        values, threshold_diff, intermediates
     )
-    plt.scatter(
-        test_dates[predictedpoints["Local_Max"]],
-        predictedpoints["WL"][predictedpoints["Local_Max"]],
-        color="purple",
-        label="Peak Points (Predicted)",
-        zorder=5,
+    jump_indices = _jump_indices(rise_indices, local_max_indices)
+    return rise_indices, local_max_indices, jump_indices
+
+
+# Function to identify rise, peak and jump points for many rise thresholds at once
+def detect_events_sweep(
+    values, thresholdmps, stable_threshold=0.05, min_stable_length=6
+):
+    """
+    Identify the critical points of a series for every value of thresholdmp.
+
+    The stable mean, the local maxima and the level differences are computed
+    once for the whole sweep. The start rise points for a threshold are the
+    steps above it, so the rises of a higher threshold are a subset of those
+    of a lower one: the rises at the lowest threshold are found once, and
+    every local max is given the largest rise leading to it, so it is found
+    at every threshold below that rise.
+
+    Parameters:
+    - values: 1-D array of water levels.
+    - thresholdmps: Values of thresholdmp (the divider of the mean peak height).
+    - stable_threshold: Maximum difference between consecutive values in a stable period.
+    - min_stable_length: Minimum number of samples for a period to count as stable.
+
+    Returns:
+    - List with, for every thresholdmp, the (rise_indices, local_max_indices, jump_indices)
+      that detect_events returns for it.
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    _, _, intermediates = _rise_threshold(values, 1, stable_threshold, min_stable_length)
+    thresholds = intermediates["peak_height"] / np.asarray(thresholdmps, dtype=float)
+
+    # Candidate rises: the steps above the lowest threshold of the sweep
+    wl_diff = np.diff(values)
+    lowest = np.nanmin(thresholds, initial=np.inf)
+    candidates = np.flatnonzero(wl_diff > lowest)
+    candidate_steps = wl_diff[candidates]
+
+    # The local max closing a rise is the point before the next fall; it is found
+    # for every threshold below the largest step among the rises it closes
+    falling = np.zeros(n, dtype=bool)
+    falling[1:] = wl_diff < 0
+    falls = _next_true_index(falling)[candidates]
+    closed = falls < n
+    fall_positions, group = np.unique(falls[closed], return_inverse=True)
+    largest_step = np.full(len(fall_positions), -np.inf)
+    np.maximum.at(largest_step, group, candidate_steps[closed])
+
+    events = []
+    for threshold in thresholds:
+        with timed_stage("rise_scan"):
+            rise_indices = candidates[candidate_steps > threshold]
+            local_max_indices = fall_positions[largest_step > threshold] - 1
+        jump_indices = _jump_indices(rise_indices, local_max_indices)
+        events.append((rise_indices, local_max_indices, jump_indices))
+    return events
+
+
+# Function to mark the given positions in a boolean array of the given length
+def _index_mask(length, indices):
+    mask = np.zeros(length, dtype=bool)
+    mask[indices] = True
+    return mask
+
+
+# Function to identify peaks and jump points
+def identify_points(data, column_name, thresholdmp):
+    values = data[column_name].to_numpy(dtype=float)
+    stable_mean, threshold_diff, intermediates = _rise_threshold(
+        values, thresholdmp, 0.05, 6
     )
-    plt.xlabel("Date")
-    plt.ylabel("WL")
-    plt.title(
-        "Observed and Predicted WL over Time with Start Rise and Local Max Points"
+    logger.info("The mean value during stable periods is: %s", stable_mean)
+    logger.info("Threshold: %s", threshold_diff)
+    rise_indices, local_max_indices = _rise_and_peak_indices(
+        values, threshold_diff, intermediates
     )
-    plt.legend()
-    plt.grid(True)
-    plt.xticks(rotation=45)
-    plt.xticks([test_dates.index[i] for i in np.arange(0, len(test_dates) - 2, 10)])
-    plt.tight_layout()
-    plt.show()
+
+    # Mark the points in the dataframe
+    data["WL_diff"] = data[column_name].diff()
+    data["Rise"] = _index_mask(len(data), rise_indices)
+    data["Local_Max"] = _index_mask(len(data), local_max_indices)
+
+    return data
+
+
+# Function to pair every local max with the next start rise point after it
+@timed_stage("jump_pairing")
+def _jump_indices(rise_indices, local_max_indices):
+    rise_indices = np.asarray(rise_indices, dtype=np.int64)
+    if kernels.use_numba():
+        return kernels.jump_scan(
+            rise_indices, np.asarray(local_max_indices, dtype=np.int64)
+        )
+    next_rise = np.searchsorted(rise_indices, local_max_indices, side="right")
+    jump_indices = rise_indices[next_rise[next_rise < len(rise_indices)]]
+    # The very first start rise point is a jump as well, unless it is the first sample
+    if rise_indices.size and rise_indices[0]:
+        jump_indices = np.concatenate((rise_indices[:1], jump_indices))
+    # The next rises follow the order of the sorted local maxima, so the indices are
+    # already sorted and only repeats (maxima sharing a next rise) have to go
+    return _unique_sorted(jump_indices)
 
 
 # Function to find jump points after each local max
 def find_jump_points(start_rise_series, local_max_series):
+    rise_indices = np.flatnonzero(start_rise_series.to_numpy(dtype=bool))
+    local_max_indices = np.flatnonzero(local_max_series.to_numpy(dtype=bool))
+    jump_indices = _jump_indices(rise_indices, local_max_indices)
+
     jump_points = pd.Series(False, index=start_rise_series.index)
+    jump_points.iloc[jump_indices] = True  # Mark as jump points
     modified_start_rise = start_rise_series.copy()
-
-    # Find the very first start rise point
-    first_start_rise_index = (
-        modified_start_rise.idxmax()
-    )  # idxmax returns the first occurrence of the maximum value (True)
-    if first_start_rise_index:
-        jump_points.iloc[first_start_rise_index] = True
-        modified_start_rise.iloc[first_start_rise_index] = False
-
-    for i in range(len(local_max_series)):
-        if local_max_series.iloc[i]:  # If this is a local max point
-            # Find the next start rise point after the local max
-            for j in range(i + 1, len(start_rise_series)):
-                if start_rise_series.iloc[j]:  # If this is a start rise point
-                    jump_points.iloc[j] = True  # Mark as a jump point
-                    modified_start_rise.iloc[j] = False  # Remove it from start rise
-                    break
+    modified_start_rise.iloc[jump_indices] = False  # Remove them from start rise
 
     return jump_points, modified_start_rise
 
 
-# Function to plot all the critical points (including jump points) identified in both series
-def plot_criticalpoints(
-    test_dates,
-    combined_df,
-    wl_column="WL_1",
-    title="Observed and Predicted WL over Time with Start Rise and Local Max Points",
+# Function to identify rise, peak and jump points for many wells at once
+def identify_points_batch(
+    values, thresholdmp, stable_threshold=0.05, min_stable_length=6
 ):
-    plt.figure(figsize=(12, 6), dpi=200)
-    plt.plot(
-        test_dates,
-        combined_df["WL"],
-        linestyle="dotted",
-        label="Observed GWL",
-        linewidth=3,
-    )
-    plt.plot(
-        test_dates,
-        combined_df[wl_column],
-        linestyle="-",
-        label="Predicted GWL",
-        linewidth=3,
-    )
+    """
+    Identify critical points for many wells at once.
 
-    # plt.scatter(
-    #     test_dates[combined_df["Rise"]],
-    #     combined_df["WL"][combined_df["Rise"]],
-    #     color="green",
-    #     label="Rising Points (Observed)",
-    #     s=100,
-    #     zorder=5,
-    # )
-    plt.scatter(
-        test_dates[combined_df["Local_Max"]],
-        combined_df["WL"][combined_df["Local_Max"]],
-        color="#1f77b4",
-        label="Peak Points (Observed)",
-        s=100,
-        zorder=5,
-        marker="^",
-    )
-    plt.scatter(
-        test_dates[combined_df["jump_point"]],
-        combined_df["WL"][combined_df["jump_point"]],
-        color="#1f77b4",
-        label="Jump Points (Observed)",
-        s=100,
-        zorder=5,
-    )
+    Parameters:
+    - values: 2-D array of water levels with one row per well and one column per time step.
+      Shorter wells can be padded with NaN at the end.
+    - thresholdmp: Scalar or per-well array dividing the mean peak height into the rise threshold.
+    - stable_threshold: Scalar or per-well array, maximum difference within a stable period.
+    - min_stable_length: Minimum number of samples for a period to count as stable.
 
-    # plt.scatter(
-    #     test_dates[combined_df[f'Rise_{wl_column.split("_")[1]}']],
-    #     combined_df[wl_column][combined_df[f'Rise_{wl_column.split("_")[1]}']],
-    #     color="green",
-    #     label="Rising Points (Predicted)",
-    #     marker="^",
-    #     s=100,
-    #     zorder=5,
-    # )
-    plt.scatter(
-        test_dates[combined_df[f'Local_Max_{wl_column.split("_")[1]}']],
-        combined_df[wl_column][combined_df[f'Local_Max_{wl_column.split("_")[1]}']],
-        color="#ff7f0e",
-        label="Peak Points (Predicted)",
-        marker="^",
-        s=100,
-        zorder=5,
-    )
-    plt.scatter(
-        test_dates[combined_df[f'jump_point_{wl_column.split("_")[1]}']],
-        combined_df[wl_column][combined_df[f'jump_point_{wl_column.split("_")[1]}']],
-        color="#ff7f0e",
-        label="Jump Points (Predicted)",
-        s=100,
-        zorder=5,
+    Returns:
+    - rise: Boolean array marking the start rise points (the "Rise" column of identify_points).
+    - local_max: Boolean array marking the local maxima (the "Local_Max" column of identify_points).
+    - jump_points: Boolean array marking the jump points (as returned by find_jump_points).
+      The start rise points left over by find_jump_points are rise & ~jump_points.
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    n_wells, n = values.shape
+    thresholdmp = np.broadcast_to(np.asarray(thresholdmp, dtype=float), (n_wells,))
+    stable_threshold = np.broadcast_to(
+        np.asarray(stable_threshold, dtype=float), (n_wells,)
     )
 
-    plt.xlabel("Date", fontsize=16)
-    plt.ylabel("Groundwater Level (m)", fontsize=16)
-    plt.ylim(0, 2.2)
-    plt.yticks(fontsize=16)
-    plt.grid(False)
-    plt.xticks(rotation=0, fontsize=16)
-    plt.xticks(
-        [test_dates.index[i] for i in np.arange(0, len(test_dates), 10)], fontsize=12
+    # Calculate the base groundwater level of every well
+    with timed_stage("stable_mean"):
+        stable = _stable_run_mask(values, stable_threshold[:, None], min_stable_length)
+        stable_count = stable.sum(axis=1)
+        stable_mean = np.where(stable, values, 0).sum(axis=1) / np.maximum(
+            stable_count, 1
+        )
+        no_stable = stable_count == 0
+        if no_stable.any():
+            stable_mean[no_stable] = np.nanmin(values[no_stable], axis=1)
+            logger.warning(
+                "Caution! No stable period detected for %d wells, lowest point used.",
+                no_stable.sum(),
+            )
+
+    # Calculate the threshold_diff from the mean height of the local maxima
+    with timed_stage("peak_finding"):
+        local_maxima = _local_maxima_mask(values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        threshold_diff = (
+            np.where(local_maxima, values - stable_mean[:, None], 0).sum(axis=1)
+            / local_maxima.sum(axis=1)
+            / thresholdmp
+        )
+
+    # Identify points where WL starts to rise and fall
+    with timed_stage("rise_scan"):
+        wl_diff = np.diff(values, axis=1)
+        rise = np.zeros((n_wells, n), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            rise[:, :-1] = wl_diff > threshold_diff[:, None]
+        falling = np.zeros((n_wells, n), dtype=bool)
+        falling[:, 1:] = wl_diff < 0
+
+        # Scan through the points after start rise, once start to fall mark as local max
+        wells, rise_indices = np.nonzero(rise)
+        falls = _next_true_index(falling)[wells, rise_indices]
+        found = falls < n
+        fall_points = np.zeros((n_wells, n), dtype=bool)
+        fall_points[wells[found], falls[found]] = True
+        local_max = np.zeros((n_wells, n), dtype=bool)
+        local_max[:, :-1] = fall_points[:, 1:]
+
+    # Pair every local max with the next start rise point after it
+    with timed_stage("jump_pairing"):
+        wells, local_max_indices = np.nonzero(local_max)
+        next_rise = _next_true_index(rise)[wells, local_max_indices]
+        found = next_rise < n
+        jump_points = np.zeros((n_wells, n), dtype=bool)
+        jump_points[wells[found], next_rise[found]] = True
+        # The very first start rise point is a jump as well, unless it is the first sample
+        first_rise = rise.argmax(axis=1)
+        first_is_jump = rise.any(axis=1) & (first_rise > 0)
+        jump_points[first_is_jump, first_rise[first_is_jump]] = True
+
+    return rise, local_max, jump_points
+
+
+# Function to identify critical points in a long-format DataFrame holding many wells
+def identify_points_long(
+    data,
+    well_column,
+    column_name,
+    thresholdmp,
+    stable_threshold=0.05,
+    min_stable_length=6,
+):
+    """
+    Identify critical points for every well of a long-format DataFrame.
+
+    Parameters:
+    - data: DataFrame with one row per well and time step, sorted by time within each well.
+    - well_column: Column holding the well IDs.
+    - column_name: Column holding the water levels.
+    - thresholdmp: Scalar, or per-well values as an array (in order of first appearance)
+      or a mapping/Series keyed by well ID.
+    - stable_threshold: Scalar, or per-well values given like thresholdmp.
+    - min_stable_length: Minimum number of samples for a period to count as stable.
+
+    Returns:
+    - data: Copy of the DataFrame with "Rise", "Local_Max" and "jump_point" columns added.
+    """
+    wells, well_ids = pd.factorize(data[well_column])
+    positions = data.groupby(wells).cumcount().to_numpy()
+
+    # Lay the wells out as rows of a NaN-padded 2-D array
+    values = np.full((len(well_ids), np.bincount(wells).max(initial=0)), np.nan)
+    values[wells, positions] = data[column_name].to_numpy(dtype=float)
+
+    def per_well(parameter):
+        if isinstance(parameter, (dict, pd.Series)):
+            return pd.Series(parameter).reindex(well_ids).to_numpy(dtype=float)
+        return parameter
+
+    rise, local_max, jump_points = identify_points_batch(
+        values,
+        per_well(thresholdmp),
+        stable_threshold=per_well(stable_threshold),
+        min_stable_length=min_stable_length,
     )
-    plt.title(title, fontsize=16)
-    plt.legend(fontsize=16)
-    plt.tight_layout()
+
+    data = data.copy()
+    data["Rise"] = rise[wells, positions]
+    data["Local_Max"] = local_max[wells, positions]
+    data["jump_point"] = jump_points[wells, positions]
+    return data
+
+
+# The plotting functions live in the plotting module so that matplotlib is only
+# imported when a plot is made; keep them reachable from here for older code
+def __getattr__(name):
+    if name in ("plot_observed_predicted_points", "plot_criticalpoints"):
+        from . import plotting
+
+        return getattr(plotting, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
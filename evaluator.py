@@ -0,0 +1,557 @@
+import numpy as np
+import pandas as pd
+
+from .data_processing import detect_events_sweep, identify_points_batch
+from .event_matching import (
+    _match_members,
+    _timing_scores,
+    _to_datetime64,
+    combine_timing_scores,
+    match_events,
+)
+
+
+# Function to calculate all metrics from the peaks and jumps of two time series
+def score_events(
+    peak_times_1,
+    peak_values_1,
+    jump_times_1,
+    peak_times_2,
+    peak_values_2,
+    jump_times_2,
+    tolerance=3,
+    matching="greedy",
+):
+    """
+    Calculate peak bias and timing scores from the critical points of two time series.
+
+    Parameters:
+    - peak_times_1, peak_values_1: Dates and water levels of the peaks in the first time series.
+    - jump_times_1: Dates of the jumps in the first time series.
+    - peak_times_2, peak_values_2: Dates and water levels of the peaks in the other time series.
+    - jump_times_2: Dates of the jumps in the other time series.
+    - tolerance: Integer number of days to consider for matching peaks and jumps.
+    - matching: "greedy" or "optimal" event matching (see event_matching.match_events).
+
+    Returns:
+    - Dict with the peak bias (as peakdiff), the timing scores (as timediff) and
+      the timing scores with extra point penalty (as timingdiff_extra, "_extra" keys).
+    """
+    times = {
+        ("Local_Max", 1): _to_datetime64(peak_times_1),
+        ("jump_point", 1): _to_datetime64(jump_times_1),
+        ("Local_Max", 2): _to_datetime64(peak_times_2),
+        ("jump_point", 2): _to_datetime64(jump_times_2),
+    }
+    penalty = tolerance + 1
+    matches = {}
+
+    def match(label, extra_cost):
+        # Greedy matching does not depend on the extra penalty, so it is shared
+        key = (label, extra_cost if matching == "optimal" else 0)
+        if key not in matches:
+            matches[key] = match_events(
+                times[label, 1],
+                times[label, 2],
+                tolerance,
+                matching=matching,
+                unmatched_cost=penalty,
+                extra_cost=extra_cost,
+            )
+        return matches[key]
+
+    # Peak bias
+    closest, matched = match("Local_Max", 0)
+    wl_1 = np.asarray(peak_values_1, dtype=float)[matched]
+    wl_2 = np.asarray(peak_values_2, dtype=float)[closest[matched]]
+    percentage_diff_scores = list(np.abs(wl_1 - wl_2) / wl_1 * 100)
+    metrics = {
+        "total_matching_peaks": len(percentage_diff_scores),
+        "avg_percentage_diff": (
+            sum(percentage_diff_scores) / len(percentage_diff_scores)
+            if percentage_diff_scores
+            else None
+        ),
+    }
+
+    # Timing scores, without and with the extra point penalty
+    for suffix, extra_cost in (("", 0), ("_extra", penalty)):
+        scores = {}
+        for label in ("Local_Max", "jump_point"):
+            closest, matched = match(label, extra_cost)
+            scores[label] = _timing_scores(
+                times[label, 1], times[label, 2], closest, matched, penalty
+            )
+            if extra_cost:
+                unused = len(times[label, 2]) - matched.sum()
+                scores[label] += [extra_cost] * unused
+        averages = combine_timing_scores(scores["Local_Max"], scores["jump_point"])
+        for name, value in zip(
+            ("avg_peak_timing_diff", "avg_jump_timing_diff", "combined_score"),
+            averages,
+        ):
+            metrics[name + suffix] = value
+
+    return metrics
+
+
+# Function to average timing differences given as per-member sums and counts
+def _combine_timing_totals(peak_sum, peak_count, jump_sum, jump_count):
+    # Same rules as combine_timing_scores, which works on the lists of differences
+    averages = []
+    for total, count in ((peak_sum, peak_count), (jump_sum, jump_count)):
+        averages.append(total / count if count else float("inf"))
+    if peak_count and jump_count:
+        combined_score = (peak_sum + jump_sum) / (peak_count + jump_count)
+    elif peak_count or jump_count:
+        combined_score = averages[0] if peak_count else averages[1]
+    else:
+        combined_score = float("inf")
+    return averages[0], averages[1], combined_score
+
+
+# Function to score a predicted series for many rise thresholds and tolerances
+def sweep_thresholds(
+    observed,
+    predicted,
+    test_dates,
+    thresholdmps,
+    tolerances=(3,),
+    matching="greedy",
+    stable_threshold=0.05,
+    min_stable_length=6,
+):
+    """
+    Evaluate a predicted series for every combination of thresholdmp and tolerance,
+    for example to calibrate thresholdmp.
+
+    The points of both series are identified for all thresholds in one pass
+    (see data_processing.detect_events_sweep), then scored at every tolerance.
+
+    Parameters:
+    - observed: Array of observed water levels.
+    - predicted: Array of predicted water levels.
+    - test_dates: Dates of the samples, shared by the observed and predicted series.
+    - thresholdmps: Values of thresholdmp (see identify_points), applied to both series.
+    - tolerances: Numbers of days to consider for matching peaks and jumps.
+    - matching: "greedy" or "optimal" event matching (see event_matching.match_events).
+    - stable_threshold: Maximum difference between consecutive values in a stable period.
+    - min_stable_length: Minimum number of samples for a period to count as stable.
+
+    Returns:
+    - scores: DataFrame indexed by thresholdmp and tolerance with the metrics of
+      Evaluator.score and the number of peaks and jumps found in each series.
+    - events: Dict mapping every thresholdmp to a dict with the "observed" and
+      "predicted" points, each as returned by Evaluator.identify_points.
+    """
+    times = _to_datetime64(test_dates)
+    series = {
+        "observed": np.asarray(observed, dtype=float).ravel(),
+        "predicted": np.asarray(predicted, dtype=float).ravel(),
+    }
+    swept = {
+        name: detect_events_sweep(
+            values,
+            thresholdmps,
+            stable_threshold=stable_threshold,
+            min_stable_length=min_stable_length,
+        )
+        for name, values in series.items()
+    }
+
+    events = {}
+    rows = []
+    for i, thresholdmp in enumerate(thresholdmps):
+        points = {
+            name: dict(zip(("Rise", "Local_Max", "jump_point"), swept[name][i]))
+            for name in series
+        }
+        events[thresholdmp] = points
+        peaks_1 = points["observed"]["Local_Max"]
+        peaks_2 = points["predicted"]["Local_Max"]
+        counts = {
+            "peaks_observed": len(peaks_1),
+            "peaks_predicted": len(peaks_2),
+            "jumps_observed": len(points["observed"]["jump_point"]),
+            "jumps_predicted": len(points["predicted"]["jump_point"]),
+        }
+        for tolerance in tolerances:
+            metrics = score_events(
+                times[peaks_1],
+                series["observed"][peaks_1],
+                times[points["observed"]["jump_point"]],
+                times[peaks_2],
+                series["predicted"][peaks_2],
+                times[points["predicted"]["jump_point"]],
+                tolerance=tolerance,
+                matching=matching,
+            )
+            rows.append(
+                {
+                    "thresholdmp": thresholdmp,
+                    "tolerance": tolerance,
+                    **counts,
+                    **metrics,
+                }
+            )
+
+    scores = pd.DataFrame(rows)
+    if len(scores):
+        scores = scores.set_index(["thresholdmp", "tolerance"])
+    return scores, events
+
+
+# Evaluate many predicted series against one observed series
+class Evaluator:
+    """
+    Evaluate predicted time series against one observed time series.
+
+    The critical points of the observed series are identified once when the
+    evaluator is created, so scoring many predicted series (model variants,
+    ensemble members) against it only has to identify the predicted points
+    and match them.
+
+    Parameters:
+    - observed: Array of observed water levels.
+    - test_dates: Dates of the samples, shared by the observed and predicted series.
+    - thresholdmp: Divider of the mean peak height used as rise threshold (see identify_points).
+    - tolerance: Integer number of days to consider for matching peaks and jumps.
+    - matching: "greedy" or "optimal" event matching (see event_matching.match_events).
+    - stable_threshold: Maximum difference between consecutive values in a stable period.
+    - min_stable_length: Minimum number of samples for a period to count as stable.
+    """
+
+    def __init__(
+        self,
+        observed,
+        test_dates,
+        thresholdmp,
+        tolerance=3,
+        matching="greedy",
+        stable_threshold=0.05,
+        min_stable_length=6,
+    ):
+        self.times = _to_datetime64(test_dates)
+        self.observed = np.asarray(observed, dtype=float).ravel()
+        self.thresholdmp = thresholdmp
+        self.tolerance = tolerance
+        self.matching = matching
+        self.stable_threshold = stable_threshold
+        self.min_stable_length = min_stable_length
+        self.observed_points = self.identify_points(self.observed)[0]
+
+    def identify_points(self, values):
+        """
+        Identify the critical points of one or more series.
+
+        Parameters:
+        - values: 1-D array of water levels, or 2-D array with one series per row.
+
+        Returns:
+        - List with, for every series, a dict mapping "Rise", "Local_Max" and "jump_point"
+          to the sorted positions of these points.
+        """
+        rise, local_max, jump_points = identify_points_batch(
+            values,
+            self.thresholdmp,
+            stable_threshold=self.stable_threshold,
+            min_stable_length=self.min_stable_length,
+        )
+        return [
+            {
+                "Rise": np.flatnonzero(rise[i]),
+                "Local_Max": np.flatnonzero(local_max[i]),
+                "jump_point": np.flatnonzero(jump_points[i]),
+            }
+            for i in range(len(rise))
+        ]
+
+    def score(self, predicted, predicted_points, tolerance=None):
+        """
+        Score a predicted series whose critical points are already identified.
+
+        Parameters:
+        - predicted: Array of predicted water levels.
+        - predicted_points: Dict of point positions as returned by identify_points.
+        - tolerance: Number of days to consider for matching (defaults to the evaluator's).
+
+        Returns:
+        - Dict with the peak bias (as peakdiff), the timing scores (as timediff) and
+          the timing scores with extra point penalty (as timingdiff_extra, "_extra" keys).
+        """
+        if tolerance is None:
+            tolerance = self.tolerance
+        predicted = np.asarray(predicted, dtype=float).ravel()
+        observed_peaks = self.observed_points["Local_Max"]
+        predicted_peaks = predicted_points["Local_Max"]
+        return score_events(
+            self.times[observed_peaks],
+            self.observed[observed_peaks],
+            self.times[self.observed_points["jump_point"]],
+            self.times[predicted_peaks],
+            predicted[predicted_peaks],
+            self.times[predicted_points["jump_point"]],
+            tolerance=tolerance,
+            matching=self.matching,
+        )
+
+    def evaluate(self, predicted, tolerance=None):
+        """
+        Evaluate one predicted series.
+
+        Parameters:
+        - predicted: Array of predicted water levels.
+        - tolerance: Number of days to consider for matching (defaults to the evaluator's).
+
+        Returns:
+        - Dict of metrics, see score.
+        """
+        predicted = np.asarray(predicted, dtype=float).ravel()
+        return self.score(predicted, self.identify_points(predicted)[0], tolerance)
+
+    def evaluate_ensemble(self, members, tolerance=None):
+        """
+        Evaluate the members of an ensemble forecast.
+
+        The critical points of all members are identified in one batch and,
+        with greedy matching, all members are matched against the observed
+        points in one pass instead of one scoring call per member.
+
+        Parameters:
+        - members: 2-D array of predicted water levels (members x time).
+        - tolerance: Number of days to consider for matching (defaults to the evaluator's).
+
+        Returns:
+        - scores: DataFrame with one row of metrics (see score) per member.
+        - spread: DataFrame with the mean, standard deviation, minimum, median and
+          maximum of every metric over the members.
+        """
+        if tolerance is None:
+            tolerance = self.tolerance
+        members = np.atleast_2d(np.asarray(members, dtype=float))
+        points = self.identify_points(members)
+        if self.matching == "greedy":
+            scores = pd.DataFrame(self._score_members(members, points, tolerance))
+        else:
+            scores = pd.DataFrame(
+                [self.score(v, p, tolerance) for v, p in zip(members, points)]
+            )
+        scores.index = pd.RangeIndex(len(members), name="Member")
+        spread = scores.astype(float).agg(["mean", "std", "min", "median", "max"]).T
+        return scores, spread
+
+    def _score_members(self, members, points, tolerance):
+        # Greedy matching does not depend on the extra penalty, so the
+        # matches of every event type serve all metrics
+        penalty = tolerance + 1
+        n_members = len(members)
+        metrics = {}
+        totals = {}
+        for label in ("Local_Max", "jump_point"):
+            observed = self.observed_points[label]
+            predicted = [member_points[label] for member_points in points]
+            counts = np.array([len(positions) for positions in predicted])
+            member_of = np.repeat(np.arange(n_members), counts)
+            positions = np.concatenate(predicted)
+            times_1 = np.broadcast_to(self.times[observed], (n_members, len(observed)))
+            times_2 = self.times[positions]
+            closest, matched = _match_members(
+                self.times[observed], times_2, member_of, n_members, tolerance
+            )
+            partner = closest[matched]
+
+            if label == "Local_Max":
+                # Peak bias
+                wl_1 = self.observed[observed][np.nonzero(matched)[1]]
+                wl_2 = members[member_of[partner], positions[partner]]
+                percentage_diff = np.abs(wl_1 - wl_2) / wl_1 * 100
+                n_matched = matched.sum(axis=1)
+                diff_sum = np.bincount(
+                    np.nonzero(matched)[0], weights=percentage_diff, minlength=n_members
+                )
+                metrics["total_matching_peaks"] = n_matched.tolist()
+                metrics["avg_percentage_diff"] = [
+                    total / count if count else None
+                    for total, count in zip(diff_sum.tolist(), n_matched.tolist())
+                ]
+
+            # Timing differences in whole days, the penalty for unmatched events
+            days = np.full(matched.shape, penalty, dtype=np.int64)
+            days[matched] = np.abs(
+                (times_2[partner] - times_1[matched]) // np.timedelta64(1, "D")
+            )
+            totals[label] = (
+                days.sum(axis=1).tolist(),
+                len(observed),
+                (counts - matched.sum(axis=1)).tolist(),
+            )
+
+        # Timing scores, without and with the extra point penalty
+        for suffix, extra_cost in (("", 0), ("_extra", penalty)):
+            averages = []
+            for member in range(n_members):
+                member_totals = []
+                for label in ("Local_Max", "jump_point"):
+                    day_sums, n_events, unused = totals[label]
+                    extra = unused[member] if extra_cost else 0
+                    member_totals += [
+                        day_sums[member] + extra_cost * extra,
+                        n_events + extra,
+                    ]
+                averages.append(_combine_timing_totals(*member_totals))
+            for name, values in zip(
+                ("avg_peak_timing_diff", "avg_jump_timing_diff", "combined_score"),
+                zip(*averages),
+            ):
+                metrics[name + suffix] = list(values)
+        return metrics
+
+    def evaluate_rolling(self, predicted, window="365D", step="30D", tolerance=None):
+        """
+        Evaluate a predicted series over sliding time windows, for example to
+        monitor a model over trailing 365-day windows stepped monthly.
+
+        The critical points are identified and matched once on the full series.
+        Every event then contributes its timing difference (and every matched
+        peak its percentage difference) at its date, so the metrics of all
+        windows follow from prefix sums over these contributions instead of
+        rescoring every window. A matched pair counts in the windows holding
+        the observed event, an unused predicted event (timingdiff_extra) in
+        those holding the predicted one. The rise threshold is the one of the
+        full series, so results can differ slightly from scoring each window
+        as a separate series.
+
+        Parameters:
+        - predicted: Array of predicted water levels.
+        - window: Length of the windows (anything accepted by pd.Timedelta).
+        - step: Spacing of the window ends (a pd.Timedelta or a pandas frequency such as "MS").
+        - tolerance: Number of days to consider for matching (defaults to the evaluator's).
+
+        Returns:
+        - DataFrame indexed by the end of every window ("End") with its start ("Start")
+          and the metrics of score over the events in (Start, End]. Windows without
+          matched peaks have a NaN avg_percentage_diff.
+        """
+        if tolerance is None:
+            tolerance = self.tolerance
+        predicted = np.asarray(predicted, dtype=float).ravel()
+        predicted_points = self.identify_points(predicted)[0]
+        penalty = tolerance + 1
+
+        # Windows (end - window, end], the first one ending a full window after the first date
+        window = pd.Timedelta(window)
+        ends = pd.date_range(
+            self.times.min() + window, self.times.max(), freq=step
+        ).to_numpy(dtype="datetime64[ns]")
+        starts = ends - window.to_timedelta64()
+
+        # Function to sum the contributions dated within every window
+        def window_sums(times, contributions):
+            order = np.argsort(times, kind="stable")
+            cumulative = np.concatenate(([0], np.cumsum(contributions[order])))
+            lower = np.searchsorted(times[order], starts, side="right")
+            upper = np.searchsorted(times[order], ends, side="right")
+            return cumulative[upper] - cumulative[lower], upper - lower
+
+        times = {}
+        for label in ("Local_Max", "jump_point"):
+            times[label, 1] = self.times[self.observed_points[label]]
+            times[label, 2] = self.times[predicted_points[label]]
+        matches = {}
+
+        def match(label, extra_cost):
+            # Greedy matching does not depend on the extra penalty, so it is shared
+            key = (label, extra_cost if self.matching == "optimal" else 0)
+            if key not in matches:
+                matches[key] = match_events(
+                    times[label, 1],
+                    times[label, 2],
+                    tolerance,
+                    matching=self.matching,
+                    unmatched_cost=penalty,
+                    extra_cost=extra_cost,
+                )
+            return matches[key]
+
+        # Peak bias
+        closest, matched = match("Local_Max", 0)
+        wl_1 = self.observed[self.observed_points["Local_Max"]][matched]
+        wl_2 = predicted[predicted_points["Local_Max"]][closest[matched]]
+        diff_sum, n_matched = window_sums(
+            times["Local_Max", 1][matched], np.abs(wl_1 - wl_2) / wl_1 * 100
+        )
+        metrics = {
+            "Start": starts,
+            "total_matching_peaks": n_matched,
+            "avg_percentage_diff": np.divide(
+                diff_sum,
+                n_matched,
+                out=np.full(len(ends), np.nan),
+                where=n_matched > 0,
+            ),
+        }
+
+        # Timing scores, without and with the extra point penalty
+        for suffix, extra_cost in (("", 0), ("_extra", penalty)):
+            totals = {}
+            for label in ("Local_Max", "jump_point"):
+                closest, matched = match(label, extra_cost)
+                times_1, times_2 = times[label, 1], times[label, 2]
+                # Timing differences in whole days, the penalty for unmatched events
+                days = np.full(len(times_1), penalty, dtype=np.int64)
+                days[matched] = np.abs(
+                    (times_2[closest[matched]] - times_1[matched])
+                    // np.timedelta64(1, "D")
+                )
+                day_sum, count = window_sums(times_1, days)
+                if extra_cost:
+                    unused = np.ones(len(times_2), dtype=bool)
+                    unused[closest[matched]] = False
+                    extra_sum, extra_count = window_sums(
+                        times_2[unused], np.full(unused.sum(), extra_cost)
+                    )
+                    day_sum = day_sum + extra_sum
+                    count = count + extra_count
+                totals[label] = day_sum, count
+
+            # Same rules as combine_timing_scores, for all windows at once
+            (peak_sum, peak_count), (jump_sum, jump_count) = totals.values()
+            for name, total, count in (
+                ("avg_peak_timing_diff", peak_sum, peak_count),
+                ("avg_jump_timing_diff", jump_sum, jump_count),
+                ("combined_score", peak_sum + jump_sum, peak_count + jump_count),
+            ):
+                metrics[name + suffix] = np.divide(
+                    total,
+                    count,
+                    out=np.full(len(ends), np.inf),
+                    where=count > 0,
+                )
+
+        return pd.DataFrame(metrics, index=pd.DatetimeIndex(ends, name="End"))
+
+    def evaluate_many(self, predictions, tolerance=None):
+        """
+        Evaluate many predicted series, identifying their critical points in one batch.
+
+        Parameters:
+        - predictions: 2-D array with one predicted series per row, or a mapping from
+          names to predicted series.
+        - tolerance: Number of days to consider for matching (defaults to the evaluator's).
+
+        Returns:
+        - DataFrame with one row of metrics per predicted series.
+        """
+        if isinstance(predictions, dict):
+            names = list(predictions)
+            values = np.array(
+                [np.ravel(predictions[name]) for name in names], dtype=float
+            )
+        else:
+            values = np.atleast_2d(np.asarray(predictions, dtype=float))
+            names = list(range(len(values)))
+        points = self.identify_points(values)
+        return pd.DataFrame(
+            [self.score(v, p, tolerance) for v, p in zip(values, points)],
+            index=pd.Index(names, name="Series"),
+        )
@@ -0,0 +1,562 @@
+import numpy as np
+import pandas as pd
+
+from . import kernels
+from .match_tables import stack_tables, timing_table
+from .profiling import timed_stage
+
+
+# Function to convert dates to a datetime64[ns] array without modifying the input
+def _to_datetime64(times):
+    return pd.DatetimeIndex(pd.to_datetime(times)).to_numpy(dtype="datetime64[ns]")
+
+
+# Function to format timestamps the way the matching tables report them
+def _format_dates(times):
+    return pd.DatetimeIndex(times).strftime("%Y-%m-%d").tolist()
+
+
+# Function to tell a single tolerance from a sequence of tolerances
+def _tolerance_list(tolerance):
+    if np.ndim(tolerance) == 0:
+        return [tolerance], False
+    return np.asarray(tolerance).tolist(), True
+
+
+# Function to find the nearest candidate of every event and its distance
+def _nearest_candidates(times_1, times_2, groups_1=None, groups_2=None):
+    nearest = np.full(len(times_1), -1, dtype=np.int64)
+    gap = np.full(len(times_1), np.inf)
+    if len(times_1) and len(times_2):
+        keys_1, keys_2 = times_1, times_2
+        if groups_1 is not None:
+            # Only candidates of the event's own group count: order by group, then
+            # time, using time ranks so that the keys stay small
+            ranks = np.unique(np.concatenate((times_1, times_2)), return_inverse=True)
+            ranks = ranks[1].ravel()
+            stride = ranks.max() + 1
+            keys_1 = groups_1 * stride + ranks[: len(times_1)]
+            keys_2 = groups_2 * stride + ranks[len(times_1) :]
+        order = np.argsort(keys_2, kind="stable")
+        sorted_keys = keys_2[order]
+        sorted_times = times_2[order]
+        # Nearest candidate at or after the event, and nearest candidate before it
+        after = np.searchsorted(sorted_keys, keys_1, side="left")
+        before = np.maximum(after - 1, 0)
+        # Among candidates sharing a timestamp, the earliest-listed one comes first
+        before = np.searchsorted(sorted_keys, sorted_keys[before], side="left")
+        after_valid = after < len(sorted_keys)
+        after = np.minimum(after, len(sorted_keys) - 1)
+        before_valid = sorted_keys[before] < keys_1
+        if groups_1 is not None:
+            after_valid &= groups_2[order[after]] == groups_1
+            before_valid &= groups_2[order[before]] == groups_1
+
+        gap_before = np.where(before_valid, times_1 - sorted_times[before], np.inf)
+        gap_after = np.where(after_valid, sorted_times[after] - times_1, np.inf)
+        take_after = (gap_after < gap_before) | (
+            (gap_after == gap_before) & (order[after] < order[before])
+        )
+        nearest = np.where(take_after, order[after], order[before])
+        gap = np.minimum(gap_before, gap_after)
+    return nearest, gap
+
+
+# Function to find the closest candidate within a tolerance window for every event
+def _closest_in_window(times_1, times_2, tolerance):
+    nearest, gap = _nearest_candidates(times_1, times_2)
+    return np.where(gap <= tolerance, nearest, -1)
+
+
+# Function to assign events to candidates with the lowest total cost
+def _optimal_assignment(times_1, times_2, tolerance, unmatched_cost, extra_cost):
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+
+    partner = np.full(len(times_1), -1, dtype=np.int64)
+    if not (len(times_1) and len(times_2)):
+        return partner
+    order_2 = np.argsort(times_2, kind="stable")
+    sorted_times = times_2[order_2]
+    order_1 = np.argsort(times_1, kind="stable")
+    # Range of candidates inside the tolerance window of every event (in time order)
+    low = np.searchsorted(sorted_times, times_1[order_1] - tolerance, side="left")
+    high = np.searchsorted(sorted_times, times_1[order_1] + tolerance, side="right")
+    has_candidates = low < high
+    order_1 = order_1[has_candidates]
+    low, high = low[has_candidates], high[has_candidates]
+    n_events, n_candidates = len(order_1), len(sorted_times)
+    if not n_events:
+        return partner
+
+    # Event-candidate pairs inside the tolerance window, the only ones stored
+    counts = high - low
+    events = np.repeat(np.arange(n_events), counts)
+    starts = np.cumsum(counts) - counts
+    candidates = np.repeat(low - starts, counts) + np.arange(counts.sum())
+    day = np.timedelta64(1, "D").astype("timedelta64[ns]").astype(np.int64)
+    gaps = sorted_times[candidates] - times_1[order_1][events]
+    days = np.abs(np.floor_divide(gaps, day)).astype(float)
+
+    # Square bipartite graph: events and dummy rows of unused candidates against
+    # candidates and dummy columns of unmatched events. An event either takes a
+    # candidate or its own dummy column, and a candidate either an event or its
+    # own dummy row; the dummy row of a taken candidate pairs up with the dummy
+    # column of the event that took it, so that edge mirrors the window pairs
+    # and the graph stays linear in their number.
+    event_range = np.arange(n_events)
+    candidate_range = np.arange(n_candidates)
+    rows = np.concatenate(
+        (events, event_range, n_events + candidate_range, n_events + candidates)
+    )
+    columns = np.concatenate(
+        (candidates, n_candidates + event_range, candidate_range, n_candidates + events)
+    )
+    costs = np.concatenate(
+        (
+            days,
+            np.full(n_events, float(unmatched_cost)),
+            np.full(n_candidates, float(extra_cost)),
+            np.zeros(len(events)),
+        )
+    )
+    # Every full matching has the same number of edges, so shifting all costs
+    # keeps the optimum and stops zero costs from being taken for missing edges
+    size = n_events + n_candidates
+    graph = coo_matrix((costs + 1, (rows, columns)), shape=(size, size)).tocsr()
+    rows, columns = min_weight_full_bipartite_matching(graph)
+
+    taken = (rows < n_events) & (columns < n_candidates)
+    partner[order_1[rows[taken]]] = order_2[columns[taken]]
+    return partner
+
+
+# Function to match events to candidates within a tolerance window
+@timed_stage("matching")
+def match_events(
+    times_1,
+    times_2,
+    tolerance,
+    matching="greedy",
+    unmatched_cost=None,
+    extra_cost=0,
+):
+    """
+    Match events of one time series to the events of another one.
+
+    With matching="greedy" events are processed in order. Each event takes its
+    closest candidate in time (the earliest-listed one on ties) if that
+    candidate lies within the tolerance window and has not been taken by an
+    earlier event.
+
+    With matching="optimal" events and candidates are paired so that the total
+    cost is lowest, whatever their order. A pair costs its timing difference in
+    whole days, an unmatched event costs unmatched_cost and an unused candidate
+    costs extra_cost. Only the pairs within the tolerance window enter the
+    (sparse) assignment problem, so memory grows linearly with their number
+    even when the windows of all events chain together.
+
+    Parameters:
+    - times_1: datetime64 array of the events to match.
+    - times_2: datetime64 array of the candidates.
+    - tolerance: Number of days to consider for matching (inclusive).
+    - matching: "greedy" or "optimal".
+    - unmatched_cost: Cost of an unmatched event for matching="optimal" (defaults to tolerance + 1).
+    - extra_cost: Cost of an unused candidate for matching="optimal".
+
+    Returns:
+    - closest: Position in times_2 of the matched candidate, or of the closest candidate in the
+      window for unmatched events, or -1 if the window is empty.
+    - matched: Boolean array, True where the event was matched to closest.
+    """
+    times_1 = np.asarray(times_1, dtype="datetime64[ns]").view(np.int64)
+    times_2 = np.asarray(times_2, dtype="datetime64[ns]").view(np.int64)
+    tolerance_ns = pd.Timedelta(days=tolerance).value
+    if matching == "greedy" and kernels.use_numba():
+        order = np.argsort(times_2, kind="stable")
+        return kernels.greedy_match_scan(times_1, times_2[order], order, tolerance_ns)
+    closest = _closest_in_window(times_1, times_2, tolerance_ns)
+
+    if matching == "greedy":
+        # An event only gets its closest candidate if no earlier event has taken it,
+        # so it is matched exactly when it is the first event to claim that candidate
+        matched = np.zeros(len(times_1), dtype=bool)
+        in_window = np.flatnonzero(closest >= 0)
+        _, first = np.unique(closest[in_window], return_index=True)
+        matched[in_window[first]] = True
+    elif matching == "optimal":
+        if unmatched_cost is None:
+            unmatched_cost = tolerance + 1
+        partner = _optimal_assignment(
+            times_1, times_2, tolerance_ns, unmatched_cost, extra_cost
+        )
+        matched = partner >= 0
+        closest[matched] = partner[matched]
+    else:
+        raise ValueError(f"Unknown matching mode: {matching!r}")
+    return closest, matched
+
+
+# Function to match events to candidates for several tolerance windows at once
+@timed_stage("matching")
+def match_events_multi(
+    times_1,
+    times_2,
+    tolerances,
+    matching="greedy",
+    unmatched_cost=None,
+    extra_cost=0,
+):
+    """
+    Match events of one time series to the events of another one for several tolerances.
+
+    With greedy matching the nearest candidate of every event does not depend
+    on the tolerance, so it is searched once and the events are sorted once by
+    the candidate they claim. Every tolerance then only keeps the events whose
+    nearest candidate lies in its window and gives each candidate to the first
+    of them, which takes linear time. A single tolerance with numba enabled
+    runs the compiled greedy scan of match_events instead; for several
+    tolerances the shared search is faster. Optimal matching is solved per
+    tolerance.
+
+    Parameters:
+    - times_1: datetime64 array of the events to match.
+    - times_2: datetime64 array of the candidates.
+    - tolerances: Numbers of days to consider for matching (inclusive).
+    - matching: "greedy" or "optimal", see match_events.
+    - unmatched_cost: Cost of an unmatched event for matching="optimal", one value for
+      all tolerances or one per tolerance (defaults to tolerance + 1).
+    - extra_cost: Cost of an unused candidate for matching="optimal", one value for
+      all tolerances or one per tolerance.
+
+    Returns:
+    - List with, for every tolerance, the (closest, matched) pair match_events returns.
+    """
+    tolerances = list(tolerances)
+    if matching != "greedy":
+        unmatched_costs = (
+            [tolerance + 1 for tolerance in tolerances]
+            if unmatched_cost is None
+            else np.broadcast_to(unmatched_cost, len(tolerances))
+        )
+        extra_costs = np.broadcast_to(extra_cost, len(tolerances))
+        return [
+            match_events(times_1, times_2, tolerance, matching, unmatched, extra)
+            for tolerance, unmatched, extra in zip(
+                tolerances, unmatched_costs, extra_costs
+            )
+        ]
+
+    times_1 = np.asarray(times_1, dtype="datetime64[ns]").view(np.int64)
+    times_2 = np.asarray(times_2, dtype="datetime64[ns]").view(np.int64)
+    if len(tolerances) == 1 and kernels.use_numba():
+        order = np.argsort(times_2, kind="stable")
+        tolerance_ns = pd.Timedelta(days=tolerances[0]).value
+        return [kernels.greedy_match_scan(times_1, times_2[order], order, tolerance_ns)]
+
+    nearest, gap = _nearest_candidates(times_1, times_2)
+    # Events grouped by the candidate they claim, in event order within a group
+    by_candidate = np.lexsort((np.arange(len(times_1)), nearest))
+    claimed = nearest[by_candidate]
+    gap_by_candidate = gap[by_candidate]
+
+    matches = []
+    for tolerance in tolerances:
+        in_window = gap_by_candidate <= pd.Timedelta(days=tolerance).value
+        events = by_candidate[in_window]
+        candidates = claimed[in_window]
+        # The first event in the window of a candidate takes it
+        first = np.ones(len(events), dtype=bool)
+        first[1:] = candidates[1:] != candidates[:-1]
+        closest = np.full(len(times_1), -1, dtype=np.int64)
+        closest[events] = candidates
+        matched = np.zeros(len(times_1), dtype=bool)
+        matched[events[first]] = True
+        matches.append((closest, matched))
+    return matches
+
+
+# Function to greedily match the same events against the candidates of many members
+@timed_stage("matching")
+def _match_members(times_1, times_2, members_2, n_members, tolerance):
+    """
+    Greedy match_events of times_1 against the candidates of every member at once.
+
+    Parameters:
+    - times_1: datetime64 array of the events to match.
+    - times_2: datetime64 array of the candidates of all members.
+    - members_2: Member of every candidate (0 to n_members - 1).
+    - n_members: Number of members.
+    - tolerance: Number of days to consider for matching (inclusive).
+
+    Returns:
+    - closest, matched: Arrays of shape (members, events) as match_events returns for
+      every member, with positions into times_2.
+    """
+    times_1 = np.asarray(times_1, dtype="datetime64[ns]").view(np.int64)
+    times_2 = np.asarray(times_2, dtype="datetime64[ns]").view(np.int64)
+    members_1 = np.repeat(np.arange(n_members), len(times_1))
+    nearest, gap = _nearest_candidates(
+        np.tile(times_1, n_members), times_2, members_1, np.asarray(members_2)
+    )
+    # Candidates are not shared between members, so one pass resolves all of them
+    closest = np.where(gap <= pd.Timedelta(days=tolerance).value, nearest, -1)
+    matched = np.zeros(len(closest), dtype=bool)
+    in_window = np.flatnonzero(closest >= 0)
+    _, first = np.unique(closest[in_window], return_index=True)
+    matched[in_window[first]] = True
+    shape = (n_members, len(times_1))
+    return closest.reshape(shape), matched.reshape(shape)
+
+
+# Function to score matched events in whole days, with a penalty for the unmatched ones
+def _timing_scores(times_1, times_2, closest, matched, unmatched_penalty):
+    days = np.zeros(len(times_1), dtype=np.int64)
+    days[matched] = np.abs(
+        (times_2[closest[matched]] - times_1[matched]) // np.timedelta64(1, "D")
+    )
+    return [
+        day if is_matched else unmatched_penalty
+        for day, is_matched in zip(days.tolist(), matched)
+    ]
+
+
+# Function to average the timing differences of peaks and jumps
+def combine_timing_scores(peak_timing_diff_scores, jump_timing_diff_scores):
+    """
+    Average the timing differences of peaks and jumps.
+
+    Parameters:
+    - peak_timing_diff_scores: List of timing differences for peaks.
+    - jump_timing_diff_scores: List of timing differences for jumps.
+
+    Returns:
+    - avg_peak_timing_diff: Average timing difference for peaks (inf if there are none).
+    - avg_jump_timing_diff: Average timing difference for jumps (inf if there are none).
+    - combined_score: Average over peaks and jumps together (inf if there are none).
+    """
+    avg_peak_timing_diff = (
+        sum(peak_timing_diff_scores) / len(peak_timing_diff_scores)
+        if peak_timing_diff_scores
+        else float("inf")
+    )
+    avg_jump_timing_diff = (
+        sum(jump_timing_diff_scores) / len(jump_timing_diff_scores)
+        if jump_timing_diff_scores
+        else float("inf")
+    )
+
+    # Combined score (weighted by the number of valid timing differences)
+    if peak_timing_diff_scores and jump_timing_diff_scores:
+        combined_score = (
+            sum(peak_timing_diff_scores) + sum(jump_timing_diff_scores)
+        ) / (len(peak_timing_diff_scores) + len(jump_timing_diff_scores))
+    elif peak_timing_diff_scores:
+        combined_score = avg_peak_timing_diff
+    elif jump_timing_diff_scores:
+        combined_score = avg_jump_timing_diff
+    else:
+        combined_score = float("inf")
+
+    return avg_peak_timing_diff, avg_jump_timing_diff, combined_score
+
+
+# Function to calculate timing differences between matched events with the matching dates
+def timing_differences(
+    times_1,
+    times_2,
+    tolerance,
+    unmatched_penalty=None,
+    record_blocked=True,
+    extra_penalty=None,
+    matching="greedy",
+    matches=None,
+    dates=None,
+):
+    """
+    Calculate timing differences between events of two time series.
+
+    Parameters:
+    - times_1: datetime64 array of the events in the first time series.
+    - times_2: datetime64 array of the events in the other time series.
+    - tolerance: Number of days to consider for matching events.
+    - unmatched_penalty: Score of an event without a match (defaults to tolerance + 1).
+    - record_blocked: Whether to record dates for events whose closest candidate was
+      already used. timing_score_alt leaves them out of the matching dates.
+    - extra_penalty: Score added for every unused event of the other time series
+      (None to skip, as in timediff).
+    - matching: "greedy" or "optimal", see match_events.
+    - matches: (closest, matched) pair already found by match_events or match_events_multi
+      for this tolerance, to skip the matching.
+    - dates: Formatted dates of times_1 and times_2, to share them between calls.
+
+    Returns:
+    - timing_diff_scores: List of timing differences in days.
+    - matching_dates_1: List of dates for events in the first time series.
+    - matching_dates_2: List of dates for matching events in the other time series.
+    """
+    times_1 = np.asarray(times_1, dtype="datetime64[ns]")
+    times_2 = np.asarray(times_2, dtype="datetime64[ns]")
+    if unmatched_penalty is None:
+        unmatched_penalty = tolerance + 1
+
+    if matches is None:
+        matches = match_events(
+            times_1,
+            times_2,
+            tolerance,
+            matching=matching,
+            unmatched_cost=unmatched_penalty,
+            extra_cost=extra_penalty or 0,
+        )
+    closest, matched = matches
+    partner = closest[matched]
+
+    timing_diff_scores = _timing_scores(
+        times_1, times_2, closest, matched, unmatched_penalty
+    )
+
+    if dates is None:
+        dates = _format_dates(times_1), _format_dates(times_2)
+    dates_1, dates_2 = dates
+    matching_dates_1 = list(dates_1)
+    matching_dates_2 = [None] * len(times_1)
+    for position, other in zip(np.flatnonzero(matched).tolist(), partner.tolist()):
+        matching_dates_2[position] = dates_2[other]
+    if not record_blocked:
+        recorded = matched | (closest < 0)
+        matching_dates_1 = [d for d, keep in zip(matching_dates_1, recorded) if keep]
+        matching_dates_2 = [d for d, keep in zip(matching_dates_2, recorded) if keep]
+
+    # Apply extra point penalty for unmatched points in the other time series
+    if extra_penalty is not None:
+        extra_points = np.setdiff1d(np.arange(len(times_2)), partner)
+        timing_diff_scores.extend([extra_penalty] * len(extra_points))
+        matching_dates_1.extend([None] * len(extra_points))
+        matching_dates_2.extend(dates_2[other] for other in extra_points.tolist())
+
+    return timing_diff_scores, matching_dates_1, matching_dates_2
+
+
+# Function to score the timing of the peaks and jumps of two time series
+def score_timing(
+    data,
+    suffix,
+    output_filename=None,
+    tolerance=3,
+    matching="greedy",
+    return_table=False,
+    record_blocked=True,
+    extra_penalty=False,
+):
+    """
+    Calculate timing differences of peaks and jumps between time series.
+
+    This is the shared implementation of timing_score.timediff,
+    timing_score_alt.timediff and timing_score_extra.timingdiff_extra, which
+    differ only in record_blocked and extra_penalty.
+
+    Parameters:
+    - data: DataFrame containing the time series data, or the EventSet of the first time series.
+    - suffix: String suffix representing the time series to compare with the first one,
+      or the EventSet of that time series when data is an EventSet.
+    - output_filename: Path of the CSV file for the match table (None to skip writing it).
+    - tolerance: Integer number of days to consider for matching peaks and jumps, or a
+      list of them to score every tolerance from one matching pass.
+    - matching: "greedy" or "optimal" event matching (see match_events).
+    - return_table: Also return the match table as a DataFrame.
+    - record_blocked: Whether events whose closest candidate was already taken appear in
+      the match table (see timing_differences).
+    - extra_penalty: Whether every unused event of the other time series adds a score of
+      tolerance + 1 days (and counts as a cost for matching="optimal").
+
+    Returns:
+    - avg_peak_timing_diff: Average timing difference for peaks.
+    - avg_jump_timing_diff: Average timing difference for jumps.
+    - combined_score: Combined average score of peak and jump timing differences.
+    - table: Match table (only with return_table=True).
+    With a list of tolerances, a dict mapping every tolerance to these values is
+    returned, and the saved table holds all tolerances with a "Tolerance" column.
+    """
+    from .events import _event_sets
+
+    # Identify peaks and jump points in both time series (data and suffix may
+    # also be the EventSets of the two series)
+    events_1, events_2 = _event_sets(data, suffix, ("Local_Max", "jump_point"))
+    events = {
+        label: (events_1.times[label], events_2.times[label])
+        for label in ("Local_Max", "jump_point")
+    }
+    # Only tabulate the matches (with dates) when they are saved or returned
+    tabulate = output_filename is not None or return_table
+    if tabulate:
+        dates = {
+            label: [_format_dates(times) for times in pair]
+            for label, pair in events.items()
+        }
+
+    # Several tolerances are scored from one matching pass
+    tolerances, several = _tolerance_list(tolerance)
+    penalties = [tolerance + 1 if extra_penalty else 0 for tolerance in tolerances]
+    all_matches = {
+        label: match_events_multi(
+            *pair, tolerances, matching=matching, extra_cost=penalties
+        )
+        for label, pair in events.items()
+    }
+
+    results = {}
+    tables = {}
+    for i, tolerance in enumerate(tolerances):
+        # Process peak points, then jump points
+        scores = {}
+        for label, pair in events.items():
+            if tabulate:
+                scores[label] = timing_differences(
+                    *pair,
+                    tolerance,
+                    record_blocked=record_blocked,
+                    extra_penalty=tolerance + 1 if extra_penalty else None,
+                    matching=matching,
+                    matches=all_matches[label][i],
+                    dates=dates[label],
+                )
+                continue
+            # Without a table the scores need no dates, only the unused candidates
+            closest, matched = all_matches[label][i]
+            timing_diff_scores = _timing_scores(
+                *pair, closest, matched, tolerance + 1
+            )
+            if extra_penalty:
+                unused = len(pair[1]) - int(matched.sum())
+                timing_diff_scores += [tolerance + 1] * unused
+            scores[label] = (timing_diff_scores,)
+
+        # Calculate average timing differences
+        results[tolerance] = combine_timing_scores(
+            scores["Local_Max"][0], scores["jump_point"][0]
+        )
+
+        if tabulate:
+            tables[tolerance] = timing_table(
+                *scores["Local_Max"], *scores["jump_point"]
+            )
+
+    if not tables:
+        return results if several else results[tolerances[0]]
+
+    # With several tolerances the tables are stacked with a Tolerance column
+    table = stack_tables(tables, "Tolerance") if several else tables[tolerances[0]]
+
+    # Save the results to a CSV file
+    if output_filename is not None:
+        table.to_csv(output_filename, index=False)
+
+    if return_table:
+        if several:
+            return {
+                tolerance: results[tolerance] + (tables[tolerance],)
+                for tolerance in tolerances
+            }
+        return results[tolerances[0]] + (table,)
+    return results if several else results[tolerances[0]]
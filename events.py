@@ -0,0 +1,190 @@
+import numpy as np
+import pandas as pd
+
+from .data_processing import detect_events
+from .event_matching import _to_datetime64
+
+# Event types, named after the columns of the DataFrame pipeline
+EVENT_TYPES = ("Rise", "Local_Max", "jump_point")
+
+
+# Critical points of one time series, stored compactly
+class EventSet:
+    """
+    Critical points of one time series as sorted position arrays.
+
+    For every event type ("Rise", "Local_Max" and "jump_point", as the columns
+    of the DataFrame pipeline) only the positions of the events are kept,
+    with their dates and water levels, instead of full-length boolean
+    columns. Positions are stored as int32 when the series is short enough.
+
+    As after find_jump_points, "Rise" holds the start rise points that are
+    not jump points.
+
+    Parameters:
+    - positions: Mapping from event type to the positions of the events.
+    - length: Number of samples in the series.
+    - times: Dates of all samples (optional), to look up the event dates.
+    - values: Water levels of all samples (optional), to look up the event levels.
+    """
+
+    def __init__(self, positions, length, times=None, values=None):
+        index_dtype = np.int32 if length < 2**31 else np.int64
+        self.length = int(length)
+        self.positions = {
+            event_type: np.unique(np.asarray(indices, dtype=index_dtype))
+            for event_type, indices in positions.items()
+        }
+        if times is not None:
+            times = _to_datetime64(times)
+        self.times = {
+            event_type: None if times is None else times[indices]
+            for event_type, indices in self.positions.items()
+        }
+        if values is not None:
+            values = np.asarray(values, dtype=float)
+        self.values = {
+            event_type: None if values is None else values[indices]
+            for event_type, indices in self.positions.items()
+        }
+
+    def __repr__(self):
+        counts = ", ".join(
+            f"{event_type}={len(indices)}"
+            for event_type, indices in self.positions.items()
+        )
+        return f"EventSet(length={self.length}, {counts})"
+
+    @classmethod
+    def detect(
+        cls,
+        values,
+        times=None,
+        thresholdmp=None,
+        stable_threshold=0.05,
+        min_stable_length=6,
+        threshold_diff=None,
+    ):
+        """
+        Identify the critical points of a series (see data_processing.detect_events).
+
+        Parameters:
+        - values: 1-D array of water levels.
+        - times: Dates of the samples (optional).
+        - thresholdmp: Divider of the mean peak height used as rise threshold.
+        - stable_threshold: Maximum difference between consecutive values in a stable period.
+        - min_stable_length: Minimum number of samples for a period to count as stable.
+        - threshold_diff: Fixed rise threshold to use instead of the one derived from thresholdmp.
+
+        Returns:
+        - EventSet of the series.
+        """
+        values = np.asarray(values, dtype=float)
+        rise_indices, local_max_indices, jump_indices = detect_events(
+            values,
+            thresholdmp,
+            stable_threshold=stable_threshold,
+            min_stable_length=min_stable_length,
+            threshold_diff=threshold_diff,
+        )
+        positions = {
+            "Rise": np.setdiff1d(rise_indices, jump_indices),
+            "Local_Max": local_max_indices,
+            "jump_point": jump_indices,
+        }
+        return cls(positions, len(values), times=times, values=values)
+
+    @classmethod
+    def from_frame(
+        cls,
+        data,
+        suffix=None,
+        column_name="WL",
+        time_column="Time",
+        event_types=EVENT_TYPES,
+    ):
+        """
+        Collect the events marked in the boolean columns of a DataFrame.
+
+        Parameters:
+        - data: DataFrame with "Rise", "Local_Max" and/or "jump_point" columns.
+        - suffix: Suffix of the columns of a compared series ("Local_Max_1" for suffix "1"),
+          or None for the unsuffixed columns.
+        - column_name: Column holding the water levels (the suffix is appended to it).
+        - time_column: Column holding the dates.
+        - event_types: Event types to collect.
+
+        Returns:
+        - EventSet of the series. Event types without a column are left out, as are the
+          levels or dates when their column is missing.
+        """
+
+        def column(name):
+            return name if suffix is None else f"{name}_{suffix}"
+
+        positions = {
+            event_type: np.flatnonzero((data[column(event_type)] == True).to_numpy())
+            for event_type in event_types
+            if column(event_type) in data
+        }
+        times = data[time_column] if time_column in data else None
+        values = (
+            data[column(column_name)].to_numpy(dtype=float)
+            if column(column_name) in data
+            else None
+        )
+        return cls(positions, len(data), times=times, values=values)
+
+    def to_frame(self, data=None, suffix=None):
+        """
+        Write the events as boolean columns, as the DataFrame pipeline marks them.
+
+        Parameters:
+        - data: DataFrame with one row per sample to add the columns to (a copy is
+          returned), or None for a new DataFrame.
+        - suffix: Suffix for the column names, or None for the unsuffixed columns.
+
+        Returns:
+        - DataFrame with one boolean column per event type.
+        """
+        data = pd.DataFrame(index=pd.RangeIndex(self.length)) if data is None else data
+        columns = {}
+        for event_type, indices in self.positions.items():
+            marks = np.zeros(self.length, dtype=bool)
+            marks[indices] = True
+            name = event_type if suffix is None else f"{event_type}_{suffix}"
+            columns[name] = marks
+        return data.assign(**columns)
+
+    @property
+    def nbytes(self):
+        """Memory held by the position, date and level arrays in bytes."""
+        arrays = [*self.positions.values(), *self.times.values(), *self.values.values()]
+        return sum(array.nbytes for array in arrays if array is not None)
+
+
+# Function to get the events of both compared series from a DataFrame or EventSets
+def _event_sets(data, suffix, event_types=EVENT_TYPES):
+    if isinstance(data, EventSet) or isinstance(suffix, EventSet):
+        if not (isinstance(data, EventSet) and isinstance(suffix, EventSet)):
+            raise ValueError("Pass either a DataFrame and a suffix or two EventSets.")
+        event_sets = data, suffix
+    else:
+        event_sets = (
+            EventSet.from_frame(data, event_types=event_types),
+            EventSet.from_frame(data, suffix, event_types=event_types),
+        )
+
+    # Matching needs the dates of the events of both series
+    for name, events in zip(("first", "other"), event_sets):
+        missing = [t for t in event_types if t not in events.positions]
+        if missing:
+            raise ValueError(
+                f"The events of the {name} series have no {', '.join(missing)}."
+            )
+        if any(events.times[t] is None for t in event_types):
+            raise ValueError(
+                f"The events of the {name} series have no dates: pass times to "
+                "EventSet.detect or a DataFrame with a Time column."
+            )
+    return event_sets
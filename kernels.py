@@ -0,0 +1,162 @@
+import importlib.util
+import logging
+import os
+
+import numpy as np
+
+# numba is optional: when it is installed the sequential scans below are compiled
+# and used instead of the NumPy implementations. Set GWLEVALUATION_DISABLE_NUMBA=1,
+# or call set_numba(False), to force the NumPy path. numba itself is only imported
+# when a kernel is first needed, so importing the package stays fast.
+logger = logging.getLogger(__name__)
+
+HAVE_NUMBA = (
+    not os.environ.get("GWLEVALUATION_DISABLE_NUMBA")
+    and importlib.util.find_spec("numba") is not None
+)
+USE_NUMBA = HAVE_NUMBA
+
+# Whether numba has been imported successfully yet
+_numba_imported = False
+
+# Compiled kernels, built on first use
+_compiled = {}
+
+
+# Function to switch between the compiled kernels and the NumPy implementations
+def set_numba(enabled):
+    """
+    Choose whether the compiled kernels are used.
+
+    Parameters:
+    - enabled: True to use the numba kernels (only possible when numba is installed),
+      False to use the NumPy implementations.
+
+    Returns:
+    - Previous setting.
+    """
+    global USE_NUMBA
+    if enabled and not HAVE_NUMBA:
+        raise ImportError("The compiled kernels require numba.")
+    previous, USE_NUMBA = USE_NUMBA, bool(enabled)
+    return previous
+
+
+# Function to tell whether the compiled kernels are used, importing numba when first asked
+def use_numba():
+    """
+    Tell whether the compiled kernels are to be used.
+
+    The first time the kernels are enabled, numba is imported. numba can be
+    installed and still fail to import, for example with a NumPy version it
+    does not support. In that case a warning is logged and the NumPy
+    implementations are used from then on.
+
+    Returns:
+    - True if the numba kernels are used, False for the NumPy implementations.
+    """
+    global HAVE_NUMBA, USE_NUMBA, _numba_imported
+    if USE_NUMBA and not _numba_imported:
+        try:
+            import numba  # noqa: F401
+        except ImportError as error:
+            logger.warning(
+                "numba could not be imported, using the NumPy implementations: %s",
+                error,
+            )
+            HAVE_NUMBA = USE_NUMBA = False
+        else:
+            _numba_imported = True
+    return USE_NUMBA
+
+
+# Scan for start rise points and the local max closing each group of rises
+def _rise_and_peak_scan(values, threshold_diff):
+    n = len(values)
+    rise_indices = np.empty(max(n - 1, 0), dtype=np.int64)
+    local_max_indices = np.empty(max(n - 1, 0), dtype=np.int64)
+    n_rises = 0
+    n_peaks = 0
+    rise_pending = False
+    for k in range(1, n):
+        step = values[k] - values[k - 1]
+        if step > threshold_diff:
+            rise_indices[n_rises] = k - 1
+            n_rises += 1
+            rise_pending = True
+        if step < 0 and rise_pending:
+            local_max_indices[n_peaks] = k - 1
+            n_peaks += 1
+            rise_pending = False
+    return rise_indices[:n_rises], local_max_indices[:n_peaks]
+
+
+# Pair every local max with the next start rise point in one merge pass
+def _jump_scan(rise_indices, local_max_indices):
+    jump_indices = np.empty(len(rise_indices), dtype=np.int64)
+    n_jumps = 0
+    n_peaks = len(local_max_indices)
+    peak = 0
+    peak_pending = False
+    for i in range(len(rise_indices)):
+        while peak < n_peaks and local_max_indices[peak] < rise_indices[i]:
+            peak_pending = True
+            peak += 1
+        # The very first start rise point is a jump as well, unless it is the first sample
+        if peak_pending or (i == 0 and rise_indices[i] > 0):
+            jump_indices[n_jumps] = rise_indices[i]
+            n_jumps += 1
+            peak_pending = False
+    return jump_indices[:n_jumps]
+
+
+# Greedily match every event to its closest unused candidate within the tolerance
+def _greedy_match_scan(times_1, sorted_times, order, tolerance):
+    closest = np.full(len(times_1), -1, dtype=np.int64)
+    matched = np.zeros(len(times_1), dtype=np.bool_)
+    used = np.zeros(len(sorted_times), dtype=np.bool_)
+    m = len(sorted_times)
+    for i in range(len(times_1)):
+        t = times_1[i]
+        after = np.searchsorted(sorted_times, t)
+        best = -1
+        best_gap = tolerance + 1
+        if after > 0:
+            # Among candidates sharing a timestamp, the earliest-listed one comes first
+            before = np.searchsorted(sorted_times, sorted_times[after - 1])
+            best_gap = t - sorted_times[before]
+            best = before
+        if after < m:
+            gap = sorted_times[after] - t
+            if best < 0 or gap < best_gap or (
+                gap == best_gap and order[after] < order[best]
+            ):
+                best_gap = gap
+                best = after
+        if best >= 0 and best_gap <= tolerance:
+            closest[i] = order[best]
+            if not used[best]:
+                used[best] = True
+                matched[i] = True
+    return closest, matched
+
+
+# Function to compile a scan with numba the first time it is needed
+def _compile(scan):
+    if scan not in _compiled:
+        from numba import njit
+
+        _compiled[scan] = njit(cache=True)(scan)
+    return _compiled[scan]
+
+
+def rise_and_peak_scan(values, threshold_diff):
+    return _compile(_rise_and_peak_scan)(values, threshold_diff)
+
+
+def jump_scan(rise_indices, local_max_indices):
+    return _compile(_jump_scan)(rise_indices, local_max_indices)
+
+
+def greedy_match_scan(times_1, sorted_times, order, tolerance):
+    return _compile(_greedy_match_scan)(times_1, sorted_times, order, tolerance)
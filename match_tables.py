@@ -0,0 +1,92 @@
+import os
+
+import pandas as pd
+
+
+# Function to tabulate the timing differences of peaks and jumps with their dates
+def timing_table(
+    peak_timing_diff_scores,
+    peak_matching_dates_1,
+    peak_matching_dates_2,
+    jump_timing_diff_scores,
+    jump_matching_dates_1,
+    jump_matching_dates_2,
+):
+    """
+    Tabulate matched peaks and jumps side by side.
+
+    Parameters:
+    - peak_timing_diff_scores: List of timing differences for peaks.
+    - peak_matching_dates_1: List of dates for peaks in the first time series.
+    - peak_matching_dates_2: List of dates for matching peaks in the other time series.
+    - jump_timing_diff_scores: List of timing differences for jumps.
+    - jump_matching_dates_1: List of dates for jumps in the first time series.
+    - jump_matching_dates_2: List of dates for matching jumps in the other time series.
+
+    Returns:
+    - DataFrame with one row per match, shorter columns padded with None.
+    """
+    columns = {
+        "Date_WL_Peak": peak_matching_dates_1,
+        "Date_WL_1_Peak": peak_matching_dates_2,
+        "Peak_Timing_Difference": peak_timing_diff_scores,
+        "Date_WL_Jump": jump_matching_dates_1,
+        "Date_WL_1_Jump": jump_matching_dates_2,
+        "Jump_Timing_Difference": jump_timing_diff_scores,
+    }
+    # Pad the lists to ensure all columns have the same length
+    max_len = max(len(values) for values in columns.values())
+    table = {"Matching_Index": list(range(1, max_len + 1))}
+    for name, values in columns.items():
+        table[name] = list(values) + [None] * (max_len - len(values))
+    return pd.DataFrame(table)
+
+
+# Function to stack match tables below each other with a column naming their origin
+def stack_tables(tables, key):
+    """
+    Stack match tables into one DataFrame.
+
+    Parameters:
+    - tables: Mapping from well ID, tolerance or any other key to a match table.
+    - key: Name of the column holding the keys of the tables, placed first.
+
+    Returns:
+    - DataFrame with all tables stacked.
+    """
+    combined = pd.concat(
+        [table.assign(**{key: name}) for name, table in tables.items()],
+        ignore_index=True,
+    )
+    return combined[[key] + [c for c in combined.columns if c != key]]
+
+
+# Function to write the match tables of many wells into one file
+def write_match_tables(tables, output_filename, key="Well", append=False):
+    """
+    Write many match tables into a single CSV or Parquet file.
+
+    Parameters:
+    - tables: Mapping from well ID (or any other key) to a match table.
+    - output_filename: Path of the output file; ".parquet" selects Parquet, anything else CSV.
+    - key: Name of the column holding the keys of the tables.
+    - append: Append to an existing CSV file instead of overwriting it (not supported for Parquet).
+
+    Returns:
+    - combined: DataFrame with all tables stacked, as written to the file.
+    """
+    combined = stack_tables(tables, key)
+
+    if str(output_filename).endswith(".parquet"):
+        if append:
+            raise ValueError("Appending is only supported for CSV files.")
+        combined.to_parquet(output_filename, index=False)
+    else:
+        write_header = not (append and os.path.exists(output_filename))
+        combined.to_csv(
+            output_filename,
+            mode="a" if append else "w",
+            header=write_header,
+            index=False,
+        )
+    return combined
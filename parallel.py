@@ -0,0 +1,135 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from .evaluator import Evaluator
+from .event_matching import _to_datetime64
+
+# Arrays shared with the worker processes, attached once per worker
+_shared = {}
+
+
+# Function to copy an array into a new shared memory block
+def _to_shared_memory(values):
+    block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+    np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[...] = values
+    return block
+
+
+# Function to attach a worker process to the shared arrays
+def _attach(arrays, test_dates, settings):
+    for name, (block_name, shape, dtype) in arrays.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _shared[name + "_block"] = block
+        _shared[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    _shared["test_dates"] = test_dates
+    _shared["settings"] = settings
+
+
+# Function to evaluate all models and tolerances of one well inside a worker
+def _evaluate_well(well):
+    settings = _shared["settings"]
+    evaluator = Evaluator(
+        _shared["observed"][well],
+        _shared["test_dates"],
+        settings["thresholdmp"],
+        matching=settings["matching"],
+        stable_threshold=settings["stable_threshold"],
+        min_stable_length=settings["min_stable_length"],
+    )
+    predicted = _shared["predicted"][:, well]
+    points = evaluator.identify_points(predicted)
+    rows = []
+    for model, (values, model_points) in enumerate(zip(predicted, points)):
+        for tolerance in settings["tolerances"]:
+            metrics = evaluator.score(values, model_points, tolerance)
+            rows.append(
+                {"Well": well, "Model": model, "Tolerance": tolerance, **metrics}
+            )
+    return rows
+
+
+# Function to evaluate many wells and models in parallel worker processes
+def evaluate_parallel(
+    observed,
+    predicted,
+    test_dates,
+    thresholdmp,
+    tolerances=(3,),
+    max_workers=None,
+    chunksize=1,
+    matching="greedy",
+    stable_threshold=0.05,
+    min_stable_length=6,
+    well_ids=None,
+    model_names=None,
+):
+    """
+    Evaluate every well, model and tolerance setting with a pool of worker processes.
+
+    The observed and predicted arrays are placed in shared memory once and the
+    workers read them from there, so no series is pickled per task. Each task
+    evaluates one well against all models and tolerances.
+
+    Parameters:
+    - observed: 2-D array of observed water levels (wells x time).
+    - predicted: 3-D array of predicted water levels (models x wells x time).
+    - test_dates: Dates of the samples, shared by all series.
+    - thresholdmp: Divider of the mean peak height used as rise threshold (see identify_points).
+    - tolerances: Numbers of days to consider for matching peaks and jumps.
+    - max_workers: Number of worker processes (defaults to the number of CPUs).
+    - chunksize: Number of wells sent to a worker at once.
+    - matching: "greedy" or "optimal" event matching (see event_matching.match_events).
+    - stable_threshold: Maximum difference between consecutive values in a stable period.
+    - min_stable_length: Minimum number of samples for a period to count as stable.
+    - well_ids: Names of the wells (defaults to their positions).
+    - model_names: Names of the models (defaults to their positions).
+
+    Returns:
+    - DataFrame with one row of metrics (see Evaluator.score) per well, model and tolerance.
+    """
+    observed = np.ascontiguousarray(observed, dtype=float)
+    predicted = np.ascontiguousarray(predicted, dtype=float)
+    if predicted.ndim == 2:
+        predicted = predicted[None]
+    test_dates = _to_datetime64(test_dates)
+    settings = {
+        "thresholdmp": thresholdmp,
+        "tolerances": list(tolerances),
+        "matching": matching,
+        "stable_threshold": stable_threshold,
+        "min_stable_length": min_stable_length,
+    }
+
+    blocks = {"observed": _to_shared_memory(observed)}
+    try:
+        blocks["predicted"] = _to_shared_memory(predicted)
+        arrays = {
+            name: (block.name, values.shape, values.dtype)
+            for (name, block), values in zip(blocks.items(), (observed, predicted))
+        }
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_attach,
+            initargs=(arrays, test_dates, settings),
+        ) as executor:
+            rows = [
+                row
+                for well_rows in executor.map(
+                    _evaluate_well, range(len(observed)), chunksize=chunksize
+                )
+                for row in well_rows
+            ]
+    finally:
+        for block in blocks.values():
+            block.close()
+            block.unlink()
+
+    results = pd.DataFrame(rows)
+    if well_ids is not None and len(results):
+        results["Well"] = np.asarray(well_ids)[results["Well"]]
+    if model_names is not None and len(results):
+        results["Model"] = np.asarray(model_names)[results["Model"]]
+    return results
@@ -1,15 +1,22 @@
-import pandas as pd
+import numpy as np
+
+from .event_matching import _format_dates, _tolerance_list, match_events_multi
+from .events import _event_sets
 
 
 # Calculate percentage differences with the matching dates included
-def peakdiff(data, suffix, tolerance=3):
+def peakdiff(data, suffix, tolerance=3, matching="greedy"):
     """
     Calculate percentage differences of peaks between time series.
 
     Parameters:
-    - data: DataFrame containing the time series data.
-    - suffix: String suffix representing the time series to compare with the first one.
-    - tolerance: Integer number of days to consider for matching peaks.
+    - data: DataFrame containing the time series data, or the EventSet of the first time series.
+    - suffix: String suffix representing the time series to compare with the first one,
+      or the EventSet of that time series when data is an EventSet.
+    - tolerance: Integer number of days to consider for matching peaks, or a list of them
+      to score every tolerance from one matching pass.
+    - matching: "greedy" to match peaks in order to the closest unused peak, or "optimal"
+      to pair peaks with the lowest total timing difference (see event_matching.match_events).
 
     Returns:
     - total_matching_peaks: Number of matching peaks found.
@@ -17,66 +24,46 @@ def peakdiff(data, suffix, tolerance=3):
     - avg_percentage_diff: Average percentage difference.
     - matching_dates_1: List of dates for peaks in the first time series.
     - matching_dates_2: List of dates for matching peaks in the other time series.
+    With a list of tolerances, a dict mapping every tolerance to these values is returned.
     """
-    peak_diff_scores = []
-    percentage_diff_scores = []
-    matching_dates_1 = []
-    matching_dates_2 = []
-    used_peaks_2 = set()
-    # Convert 'Time' to datetime
-    data["Time"] = pd.to_datetime(data["Time"])
-
-    # Identify peaks in the first time series
-    peaks_ob = data[data["Local_Max"]]
-    total_matching_peaks = 0
-
-    for _, peak_1 in peaks_ob.iterrows():
-        peak_time_1 = peak_1["Time"]
-        wl_1 = peak_1["WL"]
-
-        # Define the time window for tolerance
-        start_date = peak_time_1 - pd.Timedelta(days=tolerance)
-        end_date = peak_time_1 + pd.Timedelta(days=tolerance)
+    # Identify peaks in both time series
+    events_1, events_2 = _event_sets(data, suffix, ("Local_Max",))
+    times_1, times_2 = events_1.times["Local_Max"], events_2.times["Local_Max"]
+    wl_1, wl_2 = events_1.values["Local_Max"], events_2.values["Local_Max"]
+    dates_1 = _format_dates(times_1)
+    dates_2 = _format_dates(times_2)
 
-        # Find matching peaks in the second time series within the tolerance window
-        potential_peaks_2 = data[
-            (data[f"Local_Max_{suffix}"] == True)
-            & (pd.to_datetime(data["Time"]) >= start_date)
-            & (pd.to_datetime(data["Time"]) <= end_date)
-        ]
+    # Match every peak of the first series to the closest unused peak of the second one
+    # (several tolerances are matched in one pass)
+    tolerances, several = _tolerance_list(tolerance)
+    results = {}
+    for tolerance, (closest, matched) in zip(
+        tolerances,
+        match_events_multi(times_1, times_2, tolerances, matching),
+    ):
+        matching_wl_1 = wl_1[matched]
+        matching_wl_2 = wl_2[closest[matched]]
 
-        if not potential_peaks_2.empty:
-            # Find the closest peak in time
-            potential_peaks_2 = potential_peaks_2.copy()
-            potential_peaks_2["Time_Diff"] = abs(
-                potential_peaks_2["Time"] - peak_time_1
-            )
-            closest_peak_2 = potential_peaks_2.loc[
-                potential_peaks_2["Time_Diff"].idxmin()
-            ]
+        percentage_diff_scores = list(
+            np.abs(matching_wl_1 - matching_wl_2) / matching_wl_1 * 100
+        )
+        matching_dates_1 = [dates_1[i] for i in np.flatnonzero(matched).tolist()]
+        matching_dates_2 = [dates_2[i] for i in closest[matched].tolist()]
+        total_matching_peaks = len(percentage_diff_scores)
 
-            # Ensure the peak from series 2 is not used more than once
-            if closest_peak_2.name not in used_peaks_2:
-                peak_diff = abs(wl_1 - closest_peak_2[f"WL_{suffix}"])
-                percentage_diff = (peak_diff / wl_1) * 100
-                peak_diff_scores.append(peak_diff)
-                percentage_diff_scores.append(percentage_diff)
-                matching_dates_1.append(peak_time_1.strftime("%Y-%m-%d"))
-                matching_dates_2.append(closest_peak_2["Time"].strftime("%Y-%m-%d"))
-                used_peaks_2.add(closest_peak_2.name)
-                total_matching_peaks += 1
+        # Calculate the average percentage difference
+        avg_percentage_diff = (
+            sum(percentage_diff_scores) / len(percentage_diff_scores)
+            if percentage_diff_scores
+            else None
+        )
 
-    # Calculate the average percentage difference
-    avg_percentage_diff = (
-        sum(percentage_diff_scores) / len(percentage_diff_scores)
-        if percentage_diff_scores
-        else None
-    )
+        results[tolerance] = (
+            total_matching_peaks,
+            percentage_diff_scores,
+            avg_percentage_diff,
+            matching_dates_1,
+            matching_dates_2,
+        )
 
-    return (
-        total_matching_peaks,
-        percentage_diff_scores,
-        avg_percentage_diff,
-        matching_dates_1,
-        matching_dates_2,
-    )
+    return results if several else results[tolerances[0]]
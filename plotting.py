@@ -0,0 +1,401 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib.dates as mdates
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from .data_processing import identify_points_batch
+from .event_matching import _to_datetime64
+from .parallel import _attach, _shared, _to_shared_memory
+
+
+# Function to plot the observed and predicted time series with identified points
+def plot_observed_predicted_points(
+    test_dates, data_observed, observedpoints, data_predicted, predictedpoints
+):
+    plt.figure(figsize=(12, 8))
+    plt.plot(
+        test_dates, data_observed["WL"], marker="o", linestyle="-", label="Observed WL"
+    )
+    plt.plot(
+        test_dates,
+        data_predicted["WL"],
+        marker="o",
+        linestyle="-",
+        label="Predicted WL",
+    )
+    plt.scatter(
+        test_dates[observedpoints["Rise"]],
+        observedpoints["WL"][observedpoints["Rise"]],
+        color="green",
+        label="Rise Points (Observed)",
+        zorder=5,
+    )
+    plt.scatter(
+        test_dates[observedpoints["Local_Max"]],
+        observedpoints["WL"][observedpoints["Local_Max"]],
+        color="red",
+        label="Peak Points (Observed)",
+        zorder=5,
+    )
+    plt.scatter(
+        test_dates[predictedpoints["Rise"]],
+        predictedpoints["WL"][predictedpoints["Rise"]],
+        color="blue",
+        label="Rise Points (Predicted)",
+        zorder=5,
+    )
+    plt.scatter(
+        test_dates[predictedpoints["Local_Max"]],
+        predictedpoints["WL"][predictedpoints["Local_Max"]],
+        color="purple",
+        label="Peak Points (Predicted)",
+        zorder=5,
+    )
+    plt.xlabel("Date")
+    plt.ylabel("WL")
+    plt.title(
+        "Observed and Predicted WL over Time with Start Rise and Local Max Points"
+    )
+    plt.legend()
+    plt.grid(True)
+    plt.xticks(rotation=45)
+    plt.xticks([test_dates.index[i] for i in np.arange(0, len(test_dates) - 2, 10)])
+    plt.tight_layout()
+    plt.show()
+
+
+# Function to plot all the critical points (including jump points) identified in both series
+def plot_criticalpoints(
+    test_dates,
+    combined_df,
+    wl_column="WL_1",
+    title="Observed and Predicted WL over Time with Start Rise and Local Max Points",
+):
+    plt.figure(figsize=(12, 6), dpi=200)
+    plt.plot(
+        test_dates,
+        combined_df["WL"],
+        linestyle="dotted",
+        label="Observed GWL",
+        linewidth=3,
+    )
+    plt.plot(
+        test_dates,
+        combined_df[wl_column],
+        linestyle="-",
+        label="Predicted GWL",
+        linewidth=3,
+    )
+
+    # plt.scatter(
+    #     test_dates[combined_df["Rise"]],
+    #     combined_df["WL"][combined_df["Rise"]],
+    #     color="green",
+    #     label="Rising Points (Observed)",
+    #     s=100,
+    #     zorder=5,
+    # )
+    plt.scatter(
+        test_dates[combined_df["Local_Max"]],
+        combined_df["WL"][combined_df["Local_Max"]],
+        color="#1f77b4",
+        label="Peak Points (Observed)",
+        s=100,
+        zorder=5,
+        marker="^",
+    )
+    plt.scatter(
+        test_dates[combined_df["jump_point"]],
+        combined_df["WL"][combined_df["jump_point"]],
+        color="#1f77b4",
+        label="Jump Points (Observed)",
+        s=100,
+        zorder=5,
+    )
+
+    # plt.scatter(
+    #     test_dates[combined_df[f'Rise_{wl_column.split("_")[1]}']],
+    #     combined_df[wl_column][combined_df[f'Rise_{wl_column.split("_")[1]}']],
+    #     color="green",
+    #     label="Rising Points (Predicted)",
+    #     marker="^",
+    #     s=100,
+    #     zorder=5,
+    # )
+    plt.scatter(
+        test_dates[combined_df[f'Local_Max_{wl_column.split("_")[1]}']],
+        combined_df[wl_column][combined_df[f'Local_Max_{wl_column.split("_")[1]}']],
+        color="#ff7f0e",
+        label="Peak Points (Predicted)",
+        marker="^",
+        s=100,
+        zorder=5,
+    )
+    plt.scatter(
+        test_dates[combined_df[f'jump_point_{wl_column.split("_")[1]}']],
+        combined_df[wl_column][combined_df[f'jump_point_{wl_column.split("_")[1]}']],
+        color="#ff7f0e",
+        label="Jump Points (Predicted)",
+        s=100,
+        zorder=5,
+    )
+
+    plt.xlabel("Date", fontsize=16)
+    plt.ylabel("Groundwater Level (m)", fontsize=16)
+    plt.ylim(0, 2.2)
+    plt.yticks(fontsize=16)
+    plt.grid(False)
+    plt.xticks(rotation=0, fontsize=16)
+    plt.xticks(
+        [test_dates.index[i] for i in np.arange(0, len(test_dates), 10)], fontsize=12
+    )
+    plt.title(title, fontsize=16)
+    plt.legend(fontsize=16)
+    plt.tight_layout()
+
+
+# Function to pick the samples of a long series worth drawing
+def downsample_for_display(values, max_points=2000, keep=()):
+    """
+    Choose the samples to draw for a long series, keeping its shape and its events.
+
+    The series is cut into equal buckets and the first, lowest, highest and last
+    sample of every bucket are kept, so peaks and troughs stay visible at any
+    zoom level of the page. The positions in keep (peaks, jumps) are always kept.
+
+    Parameters:
+    - values: 1-D array of water levels.
+    - max_points: Approximate number of samples to keep (before adding keep).
+    - keep: Positions that must be kept.
+
+    Returns:
+    - Sorted positions of the samples to draw.
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if n <= max_points:
+        return np.arange(n)
+
+    n_buckets = max(max_points // 4, 1)
+    width = -(-n // n_buckets)
+    n_buckets = -(-n // width)
+    starts = np.arange(n_buckets) * width
+    padded = np.full(n_buckets * width, np.nan)
+    padded[:n] = values
+    padded = padded.reshape(n_buckets, width)
+    # Missing values never count as the lowest or highest sample
+    lowest = np.where(np.isnan(padded), np.inf, padded).argmin(axis=1)
+    highest = np.where(np.isnan(padded), -np.inf, padded).argmax(axis=1)
+    ends = np.minimum(starts + width, n) - 1
+    return np.unique(
+        np.concatenate(
+            (starts, starts + lowest, starts + highest, ends, np.asarray(keep, int))
+        )
+    )
+
+
+# Draw critical point pages on one reused figure
+class ReportRenderer:
+    """
+    Render critical point plots of many wells, one page per well.
+
+    The figure, lines and markers are created once and only their data is
+    replaced for every page, and the figure is drawn with the Agg canvas
+    directly, so nothing is shown and no pyplot state is kept. Long series
+    are downsampled for display (see downsample_for_display); the peaks and
+    jumps are always drawn at their exact positions.
+
+    Parameters:
+    - max_points: Approximate number of samples drawn per series.
+    - figsize: Size of the pages in inches.
+    - dpi: Resolution of raster pages.
+    """
+
+    def __init__(self, max_points=2000, figsize=(12, 6), dpi=100):
+        self.max_points = max_points
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(self.figure)
+        self.axes = self.figure.add_subplot()
+        self.axes.set_xlabel("Date")
+        self.axes.set_ylabel("Groundwater Level (m)")
+        self.axes.xaxis.set_major_locator(mdates.AutoDateLocator())
+        self.axes.xaxis.set_major_formatter(mdates.DateFormatter("%Y-%m-%d"))
+        self.title = self.axes.set_title("")
+
+        def line(color, label, **style):
+            return self.axes.plot([], [], color=color, label=label, **style)[0]
+
+        def markers(color, label, marker):
+            return line(color, label, linestyle="none", marker=marker, markersize=8)
+
+        self.lines = {
+            "observed": line("#1f77b4", "Observed GWL", linestyle="dotted"),
+            "predicted": line("#ff7f0e", "Predicted GWL", linestyle="-"),
+        }
+        self.markers = {}
+        for name, color in (("observed", "#1f77b4"), ("predicted", "#ff7f0e")):
+            self.markers[name, "Local_Max"] = markers(
+                color, f"Peak Points ({name.title()})", "^"
+            )
+            self.markers[name, "jump_point"] = markers(
+                color, f"Jump Points ({name.title()})", "o"
+            )
+        self.axes.legend(loc="upper right")
+        self.figure.subplots_adjust(left=0.07, right=0.98, bottom=0.1, top=0.93)
+
+    def render(
+        self,
+        path,
+        test_dates,
+        observed,
+        predicted,
+        observed_points,
+        predicted_points,
+        title="",
+    ):
+        """
+        Draw one page and save it.
+
+        Parameters:
+        - path: Output file; the suffix selects the format (".png", ".pdf", ...).
+        - test_dates: Dates of the samples, shared by both series.
+        - observed: Array of observed water levels.
+        - predicted: Array of predicted water levels.
+        - observed_points: Dict of point positions of the observed series, as returned by
+          Evaluator.identify_points (or the positions of an EventSet).
+        - predicted_points: Dict of point positions of the predicted series.
+        - title: Title of the page.
+        """
+        test_dates = np.asarray(test_dates, dtype="datetime64[ns]")
+        for name, values, points in (
+            ("observed", observed, observed_points),
+            ("predicted", predicted, predicted_points),
+        ):
+            values = np.asarray(values, dtype=float)
+            events = [points[label] for label in ("Local_Max", "jump_point")]
+            shown = downsample_for_display(
+                values, self.max_points, np.concatenate(events)
+            )
+            self.lines[name].set_data(mdates.date2num(test_dates[shown]), values[shown])
+            for label, positions in zip(("Local_Max", "jump_point"), events):
+                self.markers[name, label].set_data(
+                    mdates.date2num(test_dates[positions]), values[positions]
+                )
+        self.title.set_text(title)
+        self.axes.relim()
+        self.axes.autoscale_view()
+        # Light PNG compression: encoding takes most of the time of a page
+        options = {}
+        if str(path).lower().endswith(".png"):
+            options["pil_kwargs"] = {"compress_level": 1}
+        self.figure.savefig(path, **options)
+
+
+# Function to render the pages of one well inside a worker
+def _render_well(well):
+    settings = _shared["settings"]
+    if "renderer" not in _shared:
+        _shared["renderer"] = ReportRenderer(
+            max_points=settings["max_points"], dpi=settings["dpi"]
+        )
+    values = np.stack((_shared["observed"][well], _shared["predicted"][well]))
+    rise, local_max, jump_points = identify_points_batch(
+        values,
+        settings["thresholdmp"],
+        stable_threshold=settings["stable_threshold"],
+        min_stable_length=settings["min_stable_length"],
+    )
+    points = [
+        {
+            "Local_Max": np.flatnonzero(local_max[i]),
+            "jump_point": np.flatnonzero(jump_points[i]),
+        }
+        for i in range(2)
+    ]
+    well_id = settings["well_ids"][well]
+    path = os.path.join(settings["output_dir"], f"{well_id}.{settings['file_format']}")
+    _shared["renderer"].render(
+        path, _shared["test_dates"], *values, *points, title=f"Well {well_id}"
+    )
+    return path
+
+
+# Function to write critical point pages of many wells in parallel worker processes
+def render_reports(
+    observed,
+    predicted,
+    test_dates,
+    thresholdmp,
+    output_dir,
+    well_ids=None,
+    file_format="png",
+    max_points=2000,
+    dpi=100,
+    max_workers=None,
+    chunksize=1,
+    stable_threshold=0.05,
+    min_stable_length=6,
+):
+    """
+    Write one QA page per well with the observed and predicted series and their points.
+
+    As evaluate_parallel, the series are placed in shared memory once and
+    every worker process identifies the points of its wells and draws them
+    with its own ReportRenderer.
+
+    Parameters:
+    - observed: 2-D array of observed water levels (wells x time).
+    - predicted: 2-D array of predicted water levels (wells x time).
+    - test_dates: Dates of the samples, shared by all series.
+    - thresholdmp: Divider of the mean peak height used as rise threshold (see identify_points).
+    - output_dir: Directory for the pages (created if needed).
+    - well_ids: Names of the wells, used as file names (defaults to their positions).
+    - file_format: "png", "pdf" or any other format matplotlib can save.
+    - max_points: Approximate number of samples drawn per series.
+    - dpi: Resolution of raster pages.
+    - max_workers: Number of worker processes (defaults to the number of CPUs).
+    - chunksize: Number of wells sent to a worker at once.
+    - stable_threshold: Maximum difference between consecutive values in a stable period.
+    - min_stable_length: Minimum number of samples for a period to count as stable.
+
+    Returns:
+    - List of the paths of the pages, in the order of the wells.
+    """
+    observed = np.ascontiguousarray(np.atleast_2d(observed), dtype=float)
+    predicted = np.ascontiguousarray(np.atleast_2d(predicted), dtype=float)
+    os.makedirs(output_dir, exist_ok=True)
+    settings = {
+        "thresholdmp": thresholdmp,
+        "stable_threshold": stable_threshold,
+        "min_stable_length": min_stable_length,
+        "output_dir": output_dir,
+        "well_ids": list(range(len(observed)) if well_ids is None else well_ids),
+        "file_format": file_format,
+        "max_points": max_points,
+        "dpi": dpi,
+    }
+
+    blocks = {"observed": _to_shared_memory(observed)}
+    try:
+        blocks["predicted"] = _to_shared_memory(predicted)
+        arrays = {
+            name: (block.name, values.shape, values.dtype)
+            for (name, block), values in zip(blocks.items(), (observed, predicted))
+        }
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_attach,
+            initargs=(arrays, _to_datetime64(test_dates), settings),
+        ) as executor:
+            paths = list(
+                executor.map(_render_well, range(len(observed)), chunksize=chunksize)
+            )
+    finally:
+        for block in blocks.values():
+            block.close()
+            block.unlink()
+    return paths
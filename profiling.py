@@ -0,0 +1,106 @@
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Stages reported to the timing hooks
+STAGES = ("stable_mean", "peak_finding", "rise_scan", "jump_pairing", "matching")
+
+# Functions called with (stage, seconds) after every timed stage
+_hooks = []
+
+
+# Function to register a function called with the duration of every stage
+def add_timing_hook(callback):
+    """
+    Register a timing hook.
+
+    Parameters:
+    - callback: Function called as callback(stage, seconds) each time a stage of the
+      evaluation (see STAGES) finishes in this process.
+
+    Returns:
+    - callback, so the function can be used as a decorator.
+    """
+    _hooks.append(callback)
+    return callback
+
+
+# Function to unregister a timing hook
+def remove_timing_hook(callback):
+    _hooks.remove(callback)
+
+
+# Context manager timing a stage and reporting it to the hooks
+@contextmanager
+def timed_stage(name):
+    # Nothing is measured while no hook is registered
+    if not _hooks:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        for hook in list(_hooks):
+            hook(name, elapsed)
+
+
+# Collect the stage timings into a profile
+class Profile:
+    """
+    Aggregate the time spent in every stage of the evaluation.
+
+    Use it as a context manager to profile a block of code:
+
+        with Profile() as profile:
+            evaluator.evaluate_many(predictions)
+        print(profile.report())
+
+    or register it with add_timing_hook to profile until it is removed. Only
+    stages run in this process are seen, not those of worker processes.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.totals = {}
+        self.maxima = {}
+
+    def __call__(self, stage, seconds):
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+        self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+        self.maxima[stage] = max(self.maxima.get(stage, 0.0), seconds)
+
+    def __enter__(self):
+        add_timing_hook(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        remove_timing_hook(self)
+
+    def reset(self):
+        """Forget the timings collected so far."""
+        self.calls.clear()
+        self.totals.clear()
+        self.maxima.clear()
+
+    def report(self):
+        """
+        Summarize the collected timings.
+
+        Returns:
+        - DataFrame indexed by stage with the number of calls, the total, mean and
+          longest time in seconds and the share of the total time, slowest stage first.
+        """
+        report = pd.DataFrame(
+            {
+                "calls": pd.Series(self.calls, dtype="int64"),
+                "total": pd.Series(self.totals, dtype=float),
+                "max": pd.Series(self.maxima, dtype=float),
+            }
+        )
+        report.index.name = "Stage"
+        report.insert(2, "mean", report["total"] / report["calls"])
+        report["share"] = report["total"] / report["total"].sum()
+        return report.sort_values("total", ascending=False)
@@ -0,0 +1,196 @@
+import numpy as np
+
+
+# Detect rise, peak and jump points on a series that arrives sample by sample
+class StreamingDetector:
+    """
+    Identify critical points incrementally as new samples arrive.
+
+    Only a handful of running values are kept (the last sample, the running
+    stable-period and peak statistics, and whether a rise is waiting for its
+    peak or a peak for its jump), so memory stays bounded however long the
+    stream runs. New samples can be passed one at a time with update() or in
+    blocks with extend(); both do a constant amount of work per sample.
+
+    With a fixed threshold_diff the points are exactly those found by
+    data_processing.detect_events(values, ..., threshold_diff=threshold_diff)
+    on the complete series. Without it the rise threshold is estimated from the
+    running statistics, as identify_points does over the whole series; the
+    estimate reaches the batch value once the stream is complete, while points
+    emitted earlier used the estimate of their time.
+
+    Parameters:
+    - thresholdmp: Divider of the mean peak height used as rise threshold (see identify_points).
+    - stable_threshold: Maximum difference between consecutive values in a stable period.
+    - min_stable_length: Minimum number of samples for a period to count as stable.
+    - threshold_diff: Fixed rise threshold, or None to estimate it from the stream.
+    """
+
+    def __init__(
+        self,
+        thresholdmp=None,
+        stable_threshold=0.05,
+        min_stable_length=6,
+        threshold_diff=None,
+    ):
+        if threshold_diff is None and thresholdmp is None:
+            raise ValueError("Either thresholdmp or threshold_diff is required.")
+        self.thresholdmp = thresholdmp
+        self.stable_threshold = stable_threshold
+        self.min_stable_length = min_stable_length
+        self.threshold_diff = threshold_diff
+        self.n_samples = 0
+        self._last_value = np.nan
+        self._min_value = np.nan
+        # Stable periods: the open run and the total over runs long enough
+        self._run_length = 0
+        self._run_sum = 0.0
+        self._stable_count = 0
+        self._stable_sum = 0.0
+        # Local maxima: direction of the last non-flat step, sum and count of peak values
+        self._last_step = 0
+        self._peak_count = 0
+        self._peak_sum = 0.0
+        # Points: a rise waiting for its fall, a peak waiting for its jump
+        self._rise_pending = False
+        self._jump_pending = False
+        self._rise_seen = False
+
+    @property
+    def stable_mean(self):
+        """Mean water level over the stable periods seen so far (lowest point if none)."""
+        count, total = self._stable_count, self._stable_sum
+        if self._run_length >= self.min_stable_length:
+            count, total = count + self._run_length, total + self._run_sum
+        return total / count if count else self._min_value
+
+    @property
+    def threshold(self):
+        """Rise threshold in use: the fixed one or the current estimate."""
+        if self.threshold_diff is not None:
+            return self.threshold_diff
+        if not self._peak_count:
+            return np.nan
+        peak_mean = self._peak_sum / self._peak_count
+        return (peak_mean - self.stable_mean) / self.thresholdmp
+
+    def update(self, value):
+        """
+        Add one sample.
+
+        Returns:
+        - rise_indices, local_max_indices, jump_indices: Positions of the points found with
+          this sample (a point is only known once the sample after it has arrived).
+        """
+        return self.extend([value])
+
+    def extend(self, values):
+        """
+        Add a block of samples.
+
+        Returns:
+        - rise_indices, local_max_indices, jump_indices: Positions of the points found with
+          these samples.
+        """
+        steps, step_positions = self._advance(values)
+        return self._find_points(steps, step_positions)
+
+    def observe(self, values):
+        """
+        Add a block of samples to the running statistics without looking for points,
+        for example to estimate the rise threshold of a complete series first.
+        """
+        self._advance(values)
+
+    # Function to take in new samples and extend the running statistics
+    def _advance(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        start = self.n_samples
+        if start:
+            values_with_last = np.concatenate(([self._last_value], values))
+            step_positions = np.arange(start, start + len(values))
+        else:
+            values_with_last = values
+            step_positions = np.arange(1, len(values))
+        steps = np.diff(values_with_last)
+        if len(values):
+            self._min_value = np.fmin(self._min_value, np.fmin.reduce(values))
+            self._last_value = values[-1]
+        self.n_samples += len(values)
+
+        self._update_stable(values_with_last[1:], steps)
+        self._update_peaks(values_with_last[:-1], steps)
+        return steps, step_positions
+
+    # Function to extend the stable-period statistics
+    def _update_stable(self, step_values, steps):
+        stable = np.abs(steps) < self.stable_threshold
+        edges = np.diff(np.concatenate(([0], stable.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        lengths = ends - starts
+        totals = np.concatenate(([0], np.cumsum(np.where(stable, step_values, 0))))
+        sums = totals[ends] - totals[starts]
+        # A run starting at the first step continues the open run
+        if len(starts) and starts[0] == 0:
+            lengths[0] += self._run_length
+            sums[0] += self._run_sum
+        elif self._run_length:
+            lengths = np.concatenate(([self._run_length], lengths))
+            sums = np.concatenate(([self._run_sum], sums))
+            ends = np.concatenate(([0], ends))
+        # A run reaching the last step stays open
+        self._run_length, self._run_sum = 0, 0.0
+        if len(ends) and ends[-1] == len(steps):
+            self._run_length, self._run_sum = int(lengths[-1]), float(sums[-1])
+            lengths, sums = lengths[:-1], sums[:-1]
+        closed = lengths >= self.min_stable_length
+        self._stable_count += int(lengths[closed].sum())
+        self._stable_sum += float(sums[closed].sum())
+
+    # Function to extend the local maxima statistics (as scipy.signal.find_peaks)
+    def _update_peaks(self, step_starts, steps):
+        # Step directions: 1 up, -1 down, 0 flat, 2 for steps involving NaN
+        directions = np.where(steps > 0, 1, np.where(steps < 0, -1, 0))
+        directions[np.isnan(steps)] = 2
+        not_flat = np.flatnonzero(directions != 0)
+        previous = np.concatenate(([self._last_step], directions[not_flat[:-1]]))
+        closes_peak = (directions[not_flat] == -1) & (previous == 1)
+        # The value of a peak is the value just before the fall
+        self._peak_count += int(closes_peak.sum())
+        self._peak_sum += float(step_starts[not_flat[closes_peak]].sum())
+        if len(not_flat):
+            self._last_step = int(directions[not_flat[-1]])
+
+    # Function to find the rise, peak and jump points completed by new steps
+    def _find_points(self, steps, step_positions):
+        # A step up above the threshold marks a start rise point just before it
+        rise_indices = step_positions[steps > self.threshold] - 1
+        falls = step_positions[steps < 0]
+
+        # A fall closes a peak if a rise happened since the previous fall
+        rises_before = np.searchsorted(rise_indices, falls, side="left")
+        rises_between = np.diff(np.concatenate(([0], rises_before)))
+        if len(falls):
+            rises_between[0] += self._rise_pending
+            self._rise_pending = rises_before[-1] < len(rise_indices)
+        else:
+            self._rise_pending = self._rise_pending or bool(len(rise_indices))
+        local_max_indices = falls[rises_between > 0] - 1
+
+        # A rise is a jump if a peak happened since the previous rise
+        peaks_before = np.searchsorted(local_max_indices, rise_indices, side="left")
+        peaks_between = np.diff(np.concatenate(([0], peaks_before)))
+        is_jump = peaks_between > 0
+        if len(rise_indices):
+            is_jump[0] |= self._jump_pending
+            # The very first start rise point is a jump as well, unless it is the first sample
+            if not self._rise_seen:
+                is_jump[0] |= rise_indices[0] > 0
+            self._rise_seen = True
+            self._jump_pending = peaks_before[-1] < len(local_max_indices)
+        else:
+            self._jump_pending = self._jump_pending or bool(len(local_max_indices))
+        jump_indices = rise_indices[is_jump]
+
+        return rise_indices, local_max_indices, jump_indices
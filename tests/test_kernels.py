@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from .. import kernels
+from ..data_processing import _jump_indices, _rise_threshold, detect_events
+from ..event_matching import match_events, match_events_multi
+
+SEEDS = range(40)
+
+
+@pytest.fixture(params=[True, False], ids=["numba", "numpy"])
+def numba_mode(request):
+    if request.param and not (kernels.HAVE_NUMBA and kernels.use_numba()):
+        pytest.skip("numba is not installed")
+    previous = kernels.set_numba(request.param)
+    yield request.param
+    kernels.set_numba(previous)
+
+
+# Function to draw a random series with plateaus, sharp rises and missing values
+def _random_series(rng):
+    n = int(rng.integers(0, 400))
+    steps = rng.normal(0, 0.05, n) + (rng.random(n) < 0.05) * rng.uniform(0, 1, n)
+    values = np.round(np.cumsum(steps), 2)
+    values[rng.random(n) < 0.1] = np.nan if rng.random() < 0.3 else 0
+    return values
+
+
+# Function to draw random event times on a coarse grid, so that many coincide
+def _random_times(rng):
+    n = int(rng.integers(0, 60))
+    hours = rng.integers(0, 24 * 30, n) // 6 * 6
+    return np.datetime64("2000-01-01T00", "h") + np.sort(hours).astype("timedelta64[h]")
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_detect_events(numba_mode, seed):
+    rng = np.random.default_rng(seed)
+    values = _random_series(rng)
+    for threshold_diff in (None, 0.0, 0.1):
+        rise, local_max, jumps = detect_events(values, 4, threshold_diff=threshold_diff)
+        if threshold_diff is None:
+            threshold_diff = _rise_threshold(values, 4, 0.05, 6)[1]
+        # The plain-Python scans are the reference for both paths
+        expected_rise, expected_max = kernels._rise_and_peak_scan(
+            values, threshold_diff
+        )
+        np.testing.assert_array_equal(rise, expected_rise)
+        np.testing.assert_array_equal(local_max, expected_max)
+        np.testing.assert_array_equal(
+            jumps, kernels._jump_scan(expected_rise, expected_max)
+        )
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_jump_indices(numba_mode, seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 300))
+    rise = np.flatnonzero(rng.random(n) < rng.random())
+    local_max = np.flatnonzero(rng.random(n) < rng.random())
+    np.testing.assert_array_equal(
+        _jump_indices(rise, local_max), kernels._jump_scan(rise, local_max)
+    )
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_match_events(numba_mode, seed):
+    rng = np.random.default_rng(seed)
+    # Unsorted and duplicate timestamps on both sides
+    times_1 = rng.permutation(_random_times(rng))
+    times_2 = rng.permutation(_random_times(rng))
+    tolerances = (0, 1, 3)
+    multi = match_events_multi(times_1, times_2, tolerances)
+    for tolerance, (multi_closest, multi_matched) in zip(tolerances, multi):
+        closest, matched = match_events(times_1, times_2, tolerance)
+        # A single tolerance takes the compiled path of match_events_multi
+        [(single_closest, single_matched)] = match_events_multi(
+            times_1, times_2, [tolerance]
+        )
+        ns_1 = times_1.astype("datetime64[ns]").view(np.int64)
+        ns_2 = times_2.astype("datetime64[ns]").view(np.int64)
+        order = np.argsort(ns_2, kind="stable")
+        expected_closest, expected_matched = kernels._greedy_match_scan(
+            ns_1, ns_2[order], order, tolerance * 86_400 * 10**9
+        )
+        np.testing.assert_array_equal(closest, expected_closest)
+        np.testing.assert_array_equal(matched, expected_matched)
+        np.testing.assert_array_equal(multi_closest, expected_closest)
+        np.testing.assert_array_equal(multi_matched, expected_matched)
+        np.testing.assert_array_equal(single_closest, expected_closest)
+        np.testing.assert_array_equal(single_matched, expected_matched)